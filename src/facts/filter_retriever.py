@@ -1,15 +1,107 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
 from langchain.embeddings.base import Embeddings
 from langchain_chroma import Chroma
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import RunnableConfig
+
+
+# Query embeddings computed in bulk by `batch` / `abatch`, looked up by the
+# searches of the single queries they hand off to
+_embedded: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar(
+    "embedded_queries", default=None
+)
 
 
 class FilterRetriever(BaseRetriever):
+    """
+    Similarity search against chroma with a metadata filter (chroma `where`
+    syntax, e.g. {"source": "src/facts/facts.txt"}) applied inside chroma,
+    before the top k are picked.
+
+    `batch` / `abatch` embed every `batch_size` queries with a single
+    `embed_documents` call instead of one embedding request per query. The
+    searches then run as usual, with the given config and `max_concurrency`.
+
+    Example Usage:
+
+    retriever = FilterRetriever(db=db, embeddings=embeddings, filter={"source": path})
+    docs_per_query = retriever.batch(questions)
+    """
+
     db: Chroma
     embeddings: Embeddings
+    k: int = 4
+    filter: Optional[Dict[str, Any]] = None
+    batch_size: int = 512
+
+    def _search(self, embedding: List[float]) -> List[Document]:
+        return self.db.similarity_search_by_vector(
+            embedding, k=self.k, filter=self.filter
+        )
+
+    def _embedded(self, query: str) -> Optional[List[float]]:
+        return (_embedded.get() or {}).get(query)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = self._embedded(query) or self.embeddings.embed_query(query)
+        return self._search(embedding)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = self._embedded(query) or await self.embeddings.aembed_query(query)
+        return await asyncio.to_thread(self._search, embedding)
+
+    def _slices(self, inputs: List[str]) -> List[List[str]]:
+        return [
+            inputs[start : start + self.batch_size]
+            for start in range(0, len(inputs), self.batch_size)
+        ]
+
+    def batch(
+        self,
+        inputs: List[str],
+        config: Optional[RunnableConfig | List[RunnableConfig]] = None,
+        **kwargs: Any,
+    ) -> List[List[Document]]:
+        embedded = {}
+        for queries in self._slices(inputs):
+            embedded.update(zip(queries, self.embeddings.embed_documents(queries)))
 
-    def _get_relevant_documents(self, query: str):
-        query_embedding = self.embeddings.embed_query(query)
+        # the searches run in threads with a copy of this context
+        token = _embedded.set(embedded)
+        try:
+            return super().batch(inputs, config, **kwargs)
+        finally:
+            _embedded.reset(token)
 
-        results = self.db.similarity_search_by_vector(query_embedding)
+    async def abatch(
+        self,
+        inputs: List[str],
+        config: Optional[RunnableConfig | List[RunnableConfig]] = None,
+        **kwargs: Any,
+    ) -> List[List[Document]]:
+        slices = self._slices(inputs)
+        # every slice is embedded concurrently
+        results = await asyncio.gather(
+            *(self.embeddings.aembed_documents(queries) for queries in slices)
+        )
+        embedded = {}
+        for queries, embeddings in zip(slices, results):
+            embedded.update(zip(queries, embeddings))
 
-        return results
+        token = _embedded.set(embedded)
+        try:
+            return await super().abatch(inputs, config, **kwargs)
+        finally:
+            _embedded.reset(token)
@@ -1,25 +1,95 @@
+import hashlib
+import json
+import os
+import time
+
 from langchain_community.document_loaders import TextLoader
-from langchain_text_splitters import CharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 
 from src.pdf.app.settings import get_settings
+from src.pdf.app.text_splitter import TiktokenTextSplitter
 
 settings = get_settings()
 
-loader = TextLoader("src/facts/facts.txt")
-splitter = CharacterTextSplitter(
-    separator="\n",
-    chunk_size=200, 
-    chunk_overlap=0
-  )
-docs = loader.load_and_split(splitter)
-embeddings = OpenAIEmbeddings(
-    openai_api_key=settings.openai_api_key
-)
-
-db = Chroma.from_documents(
-    documents=docs,
-    embedding=embeddings,
-    persist_directory="src/facts/chroma_db"
-)
+PERSIST_DIRECTORY = "src/facts/chroma_db"
+# ids of every chunk currently in the collection, see chunk_id
+MANIFEST_PATH = os.path.join(PERSIST_DIRECTORY, "manifest.json")
+
+
+def chunk_id(content: str) -> str:
+    """Ids derive from the chunk text, so an unchanged chunk keeps its id"""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            # earlier manifests mapped each id to itself, iterating either
+            # form yields the ids
+            return set(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def save_manifest(ids):
+    tmp_path = f"{MANIFEST_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sorted(ids), f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def index_facts(db, docs):
+    """
+    Brings the collection in line with the given chunks: only new or changed
+    chunks are embedded and added, removed ones are deleted and unchanged
+    ones are left alone, so re-running on the same facts costs no
+    embedding calls at all.
+    """
+    manifest = load_manifest()
+    if manifest is None:
+        # indexed before there was a manifest, with random ids and duplicates
+        db.reset_collection()
+        manifest = set()
+
+    current = {chunk_id(doc.page_content): doc for doc in docs}
+    added = [id_ for id_ in current if id_ not in manifest]
+    removed = [id_ for id_ in manifest if id_ not in current]
+
+    if added:
+        db.add_documents([current[id_] for id_ in added], ids=added)
+    if removed:
+        db.delete(ids=removed)
+
+    save_manifest(current)
+    return {
+        "added": len(added),
+        "removed": len(removed),
+        "unchanged": len(current) - len(added),
+    }
+
+
+if __name__ == "__main__":
+    started = time.perf_counter()
+
+    loader = TextLoader("src/facts/facts.txt")
+    splitter = TiktokenTextSplitter(
+        separator="\n",
+        chunk_size=50,
+        chunk_overlap=0
+      )
+    docs = loader.load_and_split(splitter)
+    embeddings = OpenAIEmbeddings(
+        openai_api_key=settings.openai_api_key
+    )
+
+    db = Chroma(
+        persist_directory=PERSIST_DIRECTORY,
+        embedding_function=embeddings
+    )
+
+    summary = index_facts(db, docs)
+    print(
+        "Indexed facts in {:.3f}s: {added} added, {removed} removed, "
+        "{unchanged} unchanged".format(time.perf_counter() - started, **summary)
+    )
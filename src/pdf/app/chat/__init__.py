@@ -1,4 +1,7 @@
 from .create_embeddings import create_embeddings_for_pdf
 from .score import score_conversation, get_scores
-from .chat import build_chat
+from .chat import build_async_chat
 from .models import ChatArgs
+from .vector_stores.retrieval_cache import retrieval_cache_stats
+from .answer_cache import answer_cache_stats
+from .embeddings.openai import embedding_cache_stats
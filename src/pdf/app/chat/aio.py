@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+# One event loop per process, on a daemon thread, shared by every request.
+# It is started lazily and per pid, so forked workers get their own.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_lock = threading.Lock()
+
+_DONE = object()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_pid
+
+    with _lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(
+                target=_loop.run_forever, name="chat-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def _submit(coro: Awaitable[T]) -> Future:
+    # Coroutines run with a copy of the caller's context, so the flask app
+    # and request contexts are visible from inside them
+    context = contextvars.copy_context()
+    return context.run(asyncio.run_coroutine_threadsafe, _wrap(coro), get_loop())
+
+
+async def _wrap(coro: Awaitable[T]) -> T:
+    return await coro
+
+
+def run(coro: Awaitable[T]) -> T:
+    """
+    Runs a coroutine on the shared event loop and blocks until it is done.
+
+    Example Usage:
+
+    answer = aio.run(chat.ainvoke("What is this about?"))
+    """
+    return _submit(coro).result()
+
+
+def iterate(agen: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Consumes an async generator on the shared event loop and yields its
+    items to the (synchronous) caller as they arrive.
+
+    Example Usage:
+
+    for chunk in aio.iterate(chat.astream("What is this about?")):
+        ...
+    """
+    items: queue.Queue = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        finally:
+            items.put(_DONE)
+
+    future = _submit(pump())
+    finished = False
+    try:
+        while (item := items.get()) is not _DONE:
+            yield item
+        finished = True
+    finally:
+        if not finished:
+            # the consumer went away (e.g. the client disconnected)
+            future.cancel()
+
+    future.result()
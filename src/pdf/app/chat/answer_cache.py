@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import redis
+from app.chat.embeddings.shared import aembed_query
+from app.chat.lru import LRUCache
+from app.chat.redis import client
+from app.chat.vector_stores.retrieval_cache import current_generation
+from app.settings import get_settings
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+PREFIX = "answer_cache"
+STATS_KEY = f"{PREFIX}:stats"
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    score: float
+    # how long generating the answer took originally
+    seconds: float
+
+
+@dataclass
+class AnswerLookup:
+    """Result of a lookup, passed back to `store` on a miss."""
+
+    key: Optional[str]
+    vector: List[float]
+    hit: Optional[CachedAnswer] = None
+
+
+@dataclass(frozen=True)
+class AnswerIndex:
+    """
+    The past questions of one pdf generation, as unit length rows. Never
+    changed in place, so concurrent searches always see matching rows and
+    entries.
+    """
+
+    vectors: Optional[np.ndarray] = None
+    entries: Tuple[Dict, ...] = ()
+
+    def extended(self, entries: List[Dict]) -> "AnswerIndex":
+        rows = np.stack(
+            [
+                np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32)
+                for entry in entries
+            ]
+        )
+        vectors = rows if self.vectors is None else np.vstack([self.vectors, rows])
+        return AnswerIndex(vectors=vectors, entries=self.entries + tuple(entries))
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) + 1e-12)
+
+
+def stream_answer(answer: str) -> Iterator[str]:
+    """Splits a stored answer into word chunks, like the LLM streams them."""
+    return (chunk for chunk in re.findall(r"\S*\s*", answer) if chunk)
+
+
+class AnswerCache:
+    """
+    Answers questions about a pdf that were already asked, in other words
+    too, without retrieval or an LLM call.
+
+    Every answered question is stored with its embedding in a redis list
+    per pdf and generation (see `bump_generation`, so re-ingesting a pdf
+    starts from an empty cache). Each worker mirrors the lists it reads in
+    an in-process matrix, catching up on entries other workers appended by
+    the length of the list, and compares a new question against all past
+    ones with a single matrix-vector product. The most similar answer is
+    served if its cosine similarity reaches `threshold`.
+
+    Redis errors fall through to answering the question as usual.
+
+    :param model: Name of the embedding model, part of the redis key.
+    :param max_entries: Questions kept per pdf, later ones are not cached.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        client: redis.Redis,
+        threshold: float,
+        ttl: int,
+        model: str = "",
+        max_entries: int = 1000,
+        max_indexes: int = 256,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.client = client
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._indexes: LRUCache[AnswerIndex] = LRUCache(max_indexes, ttl=ttl)
+
+    async def lookup(self, pdf_id: str, question: str) -> AnswerLookup:
+        started = time.monotonic()
+        vector = await aembed_query(self.embeddings, question)
+        # redis calls block, keep them off the shared event loop
+        return await asyncio.to_thread(self._lookup, pdf_id, vector, started)
+
+    def _lookup(self, pdf_id: str, vector: List[float], started: float):
+        lookup = self._search(pdf_id, vector)
+
+        seconds = time.monotonic() - started
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.hincrby(STATS_KEY, "hits" if lookup.hit else "misses", 1)
+            pipeline.hincrbyfloat(STATS_KEY, "lookup_seconds", seconds)
+            if lookup.hit:
+                saved = max(0.0, lookup.hit.seconds - seconds)
+                pipeline.hincrbyfloat(STATS_KEY, "seconds_saved", saved)
+            pipeline.execute()
+        except redis.RedisError:
+            pass
+
+        return lookup
+
+    def _search(self, pdf_id: str, vector: List[float]) -> AnswerLookup:
+        try:
+            generation = current_generation(pdf_id)
+            # questions embedded by another model are never compared
+            key = f"{PREFIX}:{pdf_id}:{generation}:{self.model}:{len(vector)}"
+            index = self._sync(key)
+        except redis.RedisError:
+            logger.warning("Answer cache unavailable", exc_info=True)
+            return AnswerLookup(key=None, vector=vector)
+        except ValueError:
+            # unreadable or mismatched entries, answer as if nothing is cached
+            logger.warning("Answer cache entries of %s unusable", pdf_id, exc_info=True)
+            return AnswerLookup(key=None, vector=vector)
+
+        lookup = AnswerLookup(key=key, vector=vector)
+        if not index.entries:
+            return lookup
+
+        scores = index.vectors @ _unit(vector)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            entry = index.entries[best]
+            lookup.hit = CachedAnswer(
+                question=entry["question"],
+                answer=entry["answer"],
+                score=float(scores[best]),
+                seconds=entry["seconds"],
+            )
+        return lookup
+
+    def _sync(self, key: str) -> AnswerIndex:
+        """Brings the local index up to date with the redis list."""
+        length = self.client.llen(key)
+        index = self._indexes.get(key)
+        if index is not None and len(index.entries) == length:
+            return index
+        if index is None or len(index.entries) > length:
+            # new to this worker, or the list expired and was started again
+            index = AnswerIndex()
+        if length == 0:
+            return index
+
+        added = self.client.lrange(key, len(index.entries), length - 1)
+        index = index.extended([json.loads(entry) for entry in added])
+        self._indexes.set(key, index)
+        return index
+
+    def store(
+        self, lookup: AnswerLookup, question: str, answer: str, seconds: float
+    ) -> None:
+        if lookup.key is None or lookup.hit is not None or not answer:
+            return
+
+        entry = {
+            "question": question,
+            "answer": answer,
+            "seconds": seconds,
+            "vector": base64.b64encode(_unit(lookup.vector).tobytes()).decode(),
+        }
+        try:
+            if self.client.llen(lookup.key) >= self.max_entries:
+                return
+            pipeline = self.client.pipeline()
+            pipeline.rpush(lookup.key, json.dumps(entry))
+            pipeline.expire(lookup.key, self.ttl)
+            pipeline.execute()
+        except redis.RedisError:
+            logger.warning("Could not cache the answer for %s", lookup.key)
+
+
+def answer_cache_stats() -> Dict[str, float]:
+    try:
+        stats = client.hgetall(STATS_KEY)
+    except redis.RedisError:
+        logger.warning("Answer cache stats unavailable", exc_info=True)
+        stats = {}
+    hits = int(stats.get("hits", 0))
+    misses = int(stats.get("misses", 0))
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+        "mean_lookup_seconds": float(stats.get("lookup_seconds", 0)) / total
+        if total
+        else 0.0,
+        "seconds_saved": float(stats.get("seconds_saved", 0)),
+    }
+
+
+def build_answer_cache(embeddings: Embeddings) -> Optional[AnswerCache]:
+    """See answer_cache_ttl and answer_cache_threshold in the settings"""
+    if settings.answer_cache_ttl <= 0:
+        return None
+
+    return AnswerCache(
+        embeddings,
+        client,
+        threshold=settings.answer_cache_threshold,
+        ttl=settings.answer_cache_ttl,
+        model=settings.text_embedding_model,
+        max_entries=settings.answer_cache_max_entries,
+    )
@@ -1,67 +1,190 @@
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.chat.answer_cache import (
+    AnswerCache,
+    AnswerLookup,
+    build_answer_cache,
+    stream_answer,
+)
+from app.chat.context import assemble_context
+from app.chat.embeddings.openai import embeddings
+from app.chat.embeddings.shared import share_query_embedding
 from app.chat.llms.chatopenai import llm_registry
 from app.chat.memories.memory_registry import memory_registry
 from app.chat.models import ChatArgs
+from app.chat.pool import build_component
 from app.chat.score import get_random_component_by_score
-from app.chat.vector_stores.pinecone import retriever_registry
+from app.chat.vector_stores.retriever_registry import retriever_registry
 from app.web.api import get_conversation_components, set_conversation_components
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables.history import RunnableWithMessageHistory
-
-# Build a RAG (Retrieval-Augmented Generation) chain with conversation history
-#
-# Flow when invoked:
-# 1. Loads past messages from SQL database for the given conversation_id
-# 2. Retrieves relevant PDF chunks from Pinecone based on the user's question
-# 3. Builds a prompt with: system instructions + retrieved context + conversation history + current question
-# 4. Sends the complete prompt to ChatGPT
-# 5. Returns the response as a string
-# 6. Automatically saves both the question and response to the database
-#
-# Usage:
-#   chain.invoke(
-#       {"input": "What is this about?"},
-#       config={"configurable": {"session_id": conversation_id}}
-#   )
-
-
-def select_component(component_registry, chat_args: ChatArgs, component_type: str):
-    components = get_conversation_components(chat_args.conversation_id)
+
+# Answers to questions already asked about a pdf, see answer_cache_ttl
+answer_cache = build_answer_cache(embeddings)
+
+# Create a RAG prompt with message history
+prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a helpful assistant. Use the following context to answer the user's question:\n\n{context}",
+        ),
+        MessagesPlaceholder(variable_name="history"),
+        ("human", "{input}"),
+    ]
+)
+
+
+def print_history(conversation_id: str, messages) -> None:
+    print(f"\n=== Message History (Conversation {conversation_id}) ===")
+    for i, msg in enumerate(messages):
+        print(f"{i + 1}. [{msg.type}]: {msg.content}")
+    print(f"=== Total messages: {len(messages)} ===\n")
+
+
+def select_component(
+    component_registry,
+    chat_args: ChatArgs,
+    component_type: str,
+    components: Optional[Dict[str, str]] = None,
+):
+    components = components or get_conversation_components(chat_args.conversation_id)
     previous_component = components[component_type]
 
     if previous_component:
-        component = component_registry[previous_component](chat_args)
+        component = build_component(
+            component_registry, component_type, previous_component, chat_args
+        )
         return previous_component, component
     else:
         random_component_name = get_random_component_by_score(
             component_registry, component_type
         )
-        component = component_registry[random_component_name](chat_args)
+        component = build_component(
+            component_registry, component_type, random_component_name, chat_args
+        )
         return random_component_name, component
 
 
-def build_chat(chat_args: ChatArgs):
+class AsyncChat:
+    """
+    Answers a conversation's questions about a pdf from retrieved chunks.
+
+    Retrieval and the history load run concurrently, both are fitted into
+    the model's token budget (see app.chat.context), the answer is streamed
+    from the LLM with `astream`, and both new messages are written in one
+    go once the answer is complete. Everything awaits rather than blocks,
+    so many chats can be in flight on a single event loop (see app.chat.aio).
+
+    The first question of a conversation is looked up in the `answer_cache`
+    while retrieval runs, and a similar enough earlier question's answer is
+    streamed back instead of asking the LLM. Later questions may refer back
+    to the conversation, so they are always answered by the LLM.
+
+    Example Usage:
+
+    chat = build_async_chat(chat_args)
+    async for chunk in chat.astream("What is this about?"):
+        ...
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        retriever,
+        llm,
+        history: BaseChatMessageHistory,
+        model_name: Optional[str] = None,
+        pdf_id: Optional[str] = None,
+        answer_cache: Optional[AnswerCache] = None,
+    ):
+        self.conversation_id = conversation_id
+        self.model_name = model_name
+        self.retriever = retriever
+        self.history = history
+        self.chain = prompt | llm | StrOutputParser()
+        self.pdf_id = pdf_id
+        self.answer_cache = answer_cache if pdf_id else None
+
+    async def astream(self, input: str) -> AsyncIterator[str]:
+        started = time.monotonic()
+        if self.answer_cache:
+            # retrieval and the cache lookup, if the history calls for one,
+            # share one query embedding, started by whichever asks first
+            share_query_embedding(self.answer_cache.embeddings, input)
+        retrieval = asyncio.ensure_future(self.retriever.ainvoke(input))
+        try:
+            messages = await self.history.aget_messages()
+            print_history(self.conversation_id, messages)
+
+            lookup = await self._lookup_answer(input, messages)
+            if lookup and lookup.hit:
+                retrieval.cancel()
+                answer = lookup.hit.answer
+                for chunk in stream_answer(answer):
+                    yield chunk
+            else:
+                docs = await retrieval
+                assembled = assemble_context(docs, messages, self.model_name)
+
+                chunks = []
+                async for chunk in self.chain.astream(
+                    {
+                        "context": assembled.context,
+                        "history": assembled.history,
+                        "input": input,
+                    }
+                ):
+                    chunks.append(chunk)
+                    yield chunk
+                answer = "".join(chunks)
+        finally:
+            # the consumer may stop before retrieval was awaited
+            if not retrieval.done():
+                retrieval.cancel()
+
+        await self.history.aadd_messages(
+            [HumanMessage(content=input), AIMessage(content=answer)]
+        )
+        if lookup:
+            await asyncio.to_thread(
+                self.answer_cache.store,
+                lookup,
+                input,
+                answer,
+                time.monotonic() - started,
+            )
+
+    async def _lookup_answer(
+        self, input: str, messages: List[BaseMessage]
+    ) -> Optional[AnswerLookup]:
+        # later questions may refer back to the conversation
+        if self.answer_cache is None or messages:
+            return None
+        return await self.answer_cache.lookup(self.pdf_id, input)
+
+    async def ainvoke(self, input: str) -> str:
+        return "".join([chunk async for chunk in self.astream(input)])
+
+
+def build_async_chat(chat_args: ChatArgs) -> AsyncChat:
+    # one lookup of the conversation's components instead of one per type
+    components = get_conversation_components(chat_args.conversation_id)
+
     retriever_name, retriever = select_component(
-        retriever_registry, chat_args, "retriever"
+        retriever_registry, chat_args, "retriever", components
+    )
+    llm_name, llm = select_component(llm_registry, chat_args, "llm", components)
+    memory_name, memory = select_component(
+        memory_registry, chat_args, "memory", components
     )
-
-    llm_name, llm = select_component(llm_registry, chat_args, "llm")
-
-    memory_name, memory = select_component(memory_registry, chat_args, "memory")
 
     print(f"Using LLM: {llm_name}, Retriever: {retriever_name}, Memory: {memory_name}")
 
-    # Print message history for debugging
-    try:
-        history = memory(str(chat_args.conversation_id))
-        messages = history.messages
-        print(f"\n=== Message History (Conversation {chat_args.conversation_id}) ===")
-        for i, msg in enumerate(messages):
-            print(f"{i + 1}. [{msg.type}]: {msg.content}")
-        print(f"=== Total messages: {len(messages)} ===\n")
-    except Exception as e:
-        print(f"Could not load history: {e}")
-
     set_conversation_components(
         conversation_id=chat_args.conversation_id,
         llm=llm_name,
@@ -69,47 +192,16 @@ def build_chat(chat_args: ChatArgs):
         memory=memory_name,
     )
 
-    # Create a RAG prompt with message history
-    prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a helpful assistant. Use the following context to answer the user's question:\n\n{context}",
-            ),
-            MessagesPlaceholder(variable_name="history"),
-            ("human", "{input}"),
-        ]
-    )
-
-    # Build the RAG chain: retrieve context -> format prompt -> LLM -> parse output
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
-
-    rag_chain = (
-        {
-            "context": lambda x: format_docs(
-                retriever.invoke(x["input"])
-            ),  # retrieve relevant docs from pinecone and format as text
-            "input": lambda x: x["input"],  # pass through user input
-            "history": lambda x: x.get(
-                "history", []
-            ),  # load past messages from SQL memory
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
-    )
-
-    # Wrap the RAG chain with message history
-    chain_with_history = RunnableWithMessageHistory(
-        runnable=rag_chain,
-        get_session_history=memory,
-        input_messages_key="input",
-        history_messages_key="history",
+    return AsyncChat(
+        conversation_id=chat_args.conversation_id,
+        retriever=retriever,
+        llm=llm,
+        history=memory(str(chat_args.conversation_id)),
+        model_name=llm_name,
+        pdf_id=chat_args.pdf_id,
+        answer_cache=answer_cache,
     )
 
-    return chain_with_history
-
 
 """
 in the end our prompt looks like this:
@@ -0,0 +1,187 @@
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from app.settings import get_settings
+from app.text_splitter import get_encoding_for_model
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Roughly what the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def find_overlap(
+    head: str, tail: str, min_chars: int = 16, max_chars: int = 2000
+) -> int:
+    """
+    Length of the longest suffix of `head` that is also a prefix of `tail`,
+    i.e. the text two consecutive chunks have in common. Overlaps shorter
+    than `min_chars` are ignored as coincidental.
+
+    Example:
+
+        find_overlap("the quick brown fox jumps", "brown fox jumps over", 5) -> 15
+    """
+    probe = tail[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+
+    window = head[-max_chars:]
+    start = window.find(probe)
+    while start != -1:
+        overlap = len(window) - start
+        if tail.startswith(window[start:]):
+            return overlap
+        start = window.find(probe, start + 1)
+    return 0
+
+
+@dataclass
+class Passage:
+    """Consecutive chunks of one page, merged with their overlap removed."""
+
+    text: str
+    key: Tuple
+    docs: List[Document] = field(default_factory=list)
+
+    def join(self, text: str) -> bool:
+        """Joins the text onto either end of the passage if they overlap."""
+        if overlap := find_overlap(self.text, text):
+            self.text += text[overlap:]
+        elif overlap := find_overlap(text, self.text):
+            self.text = text + self.text[overlap:]
+        else:
+            return False
+        return True
+
+
+def merge_passages(docs: Sequence[Document]) -> List[Passage]:
+    """
+    Merges overlapping chunks of the same page into passages. Passages keep
+    the relevance order of their best ranked chunk.
+    """
+    passages: List[Passage] = []
+    for doc in docs:
+        key = (doc.metadata.get("pdf_id"), doc.metadata.get("page"))
+        joined = next(
+            (p for p in passages if p.key == key and p.join(doc.page_content)), None
+        )
+        if joined is None:
+            passages.append(Passage(text=doc.page_content, key=key, docs=[doc]))
+            continue
+
+        joined.docs.append(doc)
+        # the chunk may bridge the gap to a later passage of the same page
+        for other in passages[passages.index(joined) + 1 :]:
+            if other.key == key and joined.join(other.text):
+                joined.docs.extend(other.docs)
+                passages.remove(other)
+                break
+
+    return passages
+
+
+@dataclass
+class ContextStats:
+    chunks: int = 0
+    passages: int = 0
+    passages_used: int = 0
+    messages: int = 0
+    messages_used: int = 0
+    raw_tokens: int = 0
+    tokens: int = 0
+    overlap_tokens_saved: int = 0
+    budget_tokens_saved: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.overlap_tokens_saved + self.budget_tokens_saved
+
+
+@dataclass
+class AssembledContext:
+    context: str
+    history: List[BaseMessage]
+    stats: ContextStats
+
+
+def token_budget(model_name: Optional[str]) -> int:
+    return settings.context_token_budgets.get(model_name, settings.context_token_budget)
+
+
+def assemble_context(
+    docs: Sequence[Document],
+    history: Sequence[BaseMessage],
+    model_name: Optional[str] = None,
+    budget: Optional[int] = None,
+) -> AssembledContext:
+    """
+    Builds the prompt's context and history within the model's token budget.
+
+    Overlapping chunks of the same page are merged into one passage, then
+    passages are added in relevance order and messages newest first until
+    the budget is used. Up to a quarter of the budget is held back for the
+    history, so a large context cannot crowd out the conversation entirely.
+
+    :param budget: Tokens for context and history together, defaults to
+        the budget of `model_name` (see `context_token_budgets`).
+    """
+    encoding = get_encoding_for_model(model_name or settings.model)
+    budget = budget if budget is not None else token_budget(model_name)
+    passages = merge_passages(docs)
+
+    chunk_tokens = [
+        len(t) for t in encoding.encode_ordinary_batch([d.page_content for d in docs])
+    ]
+    passage_tokens = [
+        len(t) for t in encoding.encode_ordinary_batch([p.text for p in passages])
+    ]
+    message_tokens = [
+        len(t) + MESSAGE_OVERHEAD_TOKENS
+        for t in encoding.encode_ordinary_batch([str(m.content) for m in history])
+    ]
+
+    reserve = min(sum(message_tokens), budget // 4)
+    used = 0
+    context = []
+    for passage, tokens in zip(passages, passage_tokens):
+        if used + tokens > budget - reserve:
+            continue
+        context.append(passage.text)
+        used += tokens
+
+    kept = 0
+    for tokens in reversed(message_tokens):
+        if used + tokens > budget:
+            break
+        used += tokens
+        kept += 1
+    kept_history = list(history[len(history) - kept :])
+
+    stats = ContextStats(
+        chunks=len(docs),
+        passages=len(passages),
+        passages_used=len(context),
+        messages=len(history),
+        messages_used=kept,
+        raw_tokens=sum(chunk_tokens) + sum(message_tokens),
+        tokens=used,
+        overlap_tokens_saved=sum(chunk_tokens) - sum(passage_tokens),
+    )
+    stats.budget_tokens_saved = stats.raw_tokens - stats.overlap_tokens_saved - used
+    logger.info(
+        "Context of %s tokens (%s saved: %s overlap, %s over budget)",
+        stats.tokens,
+        stats.tokens_saved,
+        stats.overlap_tokens_saved,
+        stats.budget_tokens_saved,
+    )
+
+    return AssembledContext(
+        context="\n\n".join(context), history=kept_history, stats=stats
+    )
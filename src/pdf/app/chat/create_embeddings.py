@@ -1,37 +1,99 @@
+import uuid
+from typing import Iterable, Iterator, Optional
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.chat.vector_stores.pinecone import vectorstore
+from app.chat.embeddings.openai import embeddings
+from app.chat.ingestion.extract import PageRange, iter_pdf_chunks
+from app.chat.ingestion.pipeline import (
+    IndexGroup,
+    batched,
+    build_ingestion_pipeline,
+)
+from app.chat.vector_stores.local import get_local_store
+from app.chat.vector_stores.pinecone import get_index
+from app.chat.vector_stores.retrieval_cache import bump_generation
+from app.settings import get_settings
+from app.web.api import add_chunks
+from langchain_core.documents import Document
 
-def create_embeddings_for_pdf(pdf_id: str, pdf_path: str):
+settings = get_settings()
+
+CHUNK_ID_NAMESPACE = uuid.UUID("7d024c21-530c-48a9-bbd3-12a30a95d2f5")
+
+
+def chunk_id(pdf_id: str, page: int, ordinal: int) -> str:
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{pdf_id}:{page}:{ordinal}"))
+
+
+def with_pdf_metadata(pdf_id: str, docs: Iterable[Document]) -> Iterator[Document]:
+    """
+    Assigns each chunk its vector id and the metadata stored in the index.
+
+    Ids are derived from (pdf_id, page, position of the chunk on the page),
+    so ingesting a pdf or a page range again, e.g. when a task is retried,
+    overwrites its vectors and chunk rows instead of adding duplicates.
+    """
+    page, ordinal = None, 0
+    for doc in docs:
+        if doc.metadata["page"] != page:
+            page, ordinal = doc.metadata["page"], 0
+        doc.id = chunk_id(pdf_id, page, ordinal)
+        ordinal += 1
+        doc.metadata = {
+            "pdf_id": pdf_id,
+            "page": page,
+        }
+        yield doc
+
+
+def store_chunks(docs: Iterable[Document]) -> Iterator[Document]:
+    """Writes the chunk texts to the chunk store in batches as they stream by."""
+    for batch in batched(docs, settings.embed_batch_size):
+        add_chunks(batch)
+        yield from batch
+
+
+def get_ingestion_index():
+    """Pinecone, plus the local vector store when local_vector_store_dir is set"""
+    if settings.local_vector_store_dir:
+        return IndexGroup([get_index(), get_local_store()])
+    return get_index()
+
+
+def create_embeddings_for_pdf(
+    pdf_id: str, pdf_path: str, page_range: Optional[PageRange] = None
+):
     """
     Generate and store embeddings for the given pdf
 
     1. Extract text from the specified PDF.
     2. Divide the extracted text into manageable chunks.
-    3. Generate an embedding for each chunk.
-    4. Persist the generated embeddings.
+    3. Store the text of each chunk in the chunk store.
+    4. Generate an embedding for each chunk.
+    5. Persist the generated embeddings, tagged with only the chunk id,
+       pdf_id and page.
+    6. Invalidate the retrieval cache of the pdf.
+
+    The steps form a stream: pages are loaded lazily and each chunk flows
+    through splitting, metadata, embedding and upserting in bounded batches
+    (see `IngestionPipeline`), so memory use does not grow with the size of
+    the PDF. Large PDFs are extracted in parallel, sharded by page range
+    (see `ingestion_workers` in the settings).
 
     :param pdf_id: The unique identifier for the PDF.
     :param pdf_path: The file path to the PDF.
+    :param page_range: Only ingest the pages [start, end), defaults to all.
 
     Example Usage:
 
     create_embeddings_for_pdf('123456', '/path/to/pdf')
     """
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=100,
+    docs = store_chunks(
+        with_pdf_metadata(pdf_id, iter_pdf_chunks(pdf_path, page_range))
     )
 
-    loader = PyPDFLoader(pdf_path)
-    docs = loader.load_and_split(text_splitter)
+    report = build_ingestion_pipeline(embeddings, get_ingestion_index()).run(docs)
 
-    for doc in docs:
-        doc.metadata = {
-            "pdf_id": pdf_id,
-            "text": doc.page_content,
-            "page": doc.metadata["page"]
-        }
+    # cached retrievals of this pdf no longer reflect the index
+    bump_generation(pdf_id)
 
-    vectorstore.add_documents(documents=docs)
+    return report
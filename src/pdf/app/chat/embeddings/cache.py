@@ -0,0 +1,263 @@
+import asyncio
+import hashlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+import redis
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+Vector = List[float]
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def decode_vector(data: bytes) -> Vector:
+    return array("f", data).tolist()
+
+
+class EmbeddingStore(ABC):
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[Vector]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_many(self, vectors: Dict[str, Vector]) -> None:
+        raise NotImplementedError
+
+
+class SQLiteEmbeddingStore(EmbeddingStore):
+    """Local on-disk store, one row per content key."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> List[Optional[Vector]]:
+        found = {}
+        # stay well below sqlite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+            found.update(rows)
+
+        return [decode_vector(found[key]) if key in found else None for key in keys]
+
+    def set_many(self, vectors: Dict[str, Vector]) -> None:
+        rows = [(key, encode_vector(vector)) for key, vector in vectors.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)", rows
+            )
+            self._conn.commit()
+
+
+class RedisEmbeddingStore(EmbeddingStore):
+    """
+    Shared store with least recently used eviction once the stored vectors
+    exceed `max_bytes`.
+
+    Recency is tracked in a sorted set scored by last access time, and the
+    total size in a counter, so eviction never has to scan the keyspace.
+    Redis errors fail open: reads miss and writes are skipped.
+    """
+
+    def __init__(self, client, max_bytes: int, prefix: str = "embedding_cache"):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lru_key = f"{prefix}:lru"
+        self.bytes_key = f"{prefix}:bytes"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get_many(self, keys: List[str]) -> List[Optional[Vector]]:
+        if not keys:
+            return []
+
+        try:
+            values = self.client.mget([self._key(key) for key in keys])
+            hits = {key: time.time() for key, value in zip(keys, values) if value}
+            if hits:
+                self.client.zadd(self.lru_key, hits, xx=True)
+        except redis.RedisError:
+            logger.warning("Embedding cache unavailable, embedding %d texts", len(keys))
+            return [None] * len(keys)
+
+        return [decode_vector(value) if value else None for value in values]
+
+    def set_many(self, vectors: Dict[str, Vector]) -> None:
+        if not vectors:
+            return
+
+        encoded = {key: encode_vector(vector) for key, vector in vectors.items()}
+        try:
+            self._store(encoded)
+        except redis.RedisError:
+            logger.warning("Could not cache %d embeddings", len(encoded))
+
+    def _store(self, encoded: Dict[str, bytes]) -> None:
+        pipe = self.client.pipeline()
+        for key, data in encoded.items():
+            pipe.set(self._key(key), data, nx=True)
+        created = pipe.execute()
+
+        added = sum(
+            len(data) for data, was_set in zip(encoded.values(), created) if was_set
+        )
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zadd(self.lru_key, {key: now for key in encoded})
+        pipe.incrby(self.bytes_key, added)
+        _, total = pipe.execute()
+
+        if total > self.max_bytes:
+            self._evict(total)
+
+    def _evict(self, total: int) -> None:
+        while total > self.max_bytes:
+            # pop roughly as many entries as needed to get under the cap
+            entries = self.client.zcard(self.lru_key)
+            average = total / entries if entries else total
+            count = min(100, max(1, math.ceil((total - self.max_bytes) / average)))
+
+            oldest = self.client.zpopmin(self.lru_key, count)
+            if not oldest:
+                break
+
+            keys = [self._key(key.decode()) for key, _ in oldest]
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.strlen(key)
+            pipe.delete(*keys)
+            *sizes, _ = pipe.execute()
+
+            total = self.client.decrby(self.bytes_key, sum(sizes))
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content addressed cache in front of an embeddings model.
+
+    Vectors are keyed by hash(model, dimensions, text), so identical chunks
+    are embedded once no matter which pdf or query they come from. Hits and
+    misses are counted per process.
+
+    Example Usage:
+
+    embeddings = CachedEmbeddings(OpenAIEmbeddings(...), SQLiteEmbeddingStore(path))
+    """
+
+    def __init__(self, underlying: Embeddings, store: EmbeddingStore):
+        self.underlying = underlying
+        self.store = store
+        self.namespace = "{}:{}".format(
+            getattr(underlying, "model", type(underlying).__name__),
+            getattr(underlying, "dimensions", None),
+        )
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}:{text}".encode()).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[Vector]:
+        keys = [self.key(text) for text in texts]
+        vectors = self.store.get_many(keys)
+
+        # identical texts within one call are only embedded once
+        missing: Dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+
+        if missing:
+            computed = dict(
+                zip(
+                    missing.keys(),
+                    self.underlying.embed_documents(list(missing.values())),
+                )
+            )
+            self.store.set_many(computed)
+            vectors = [
+                vector if vector is not None else computed[key]
+                for key, vector in zip(keys, vectors)
+            ]
+
+        self._count(hits=len(texts) - len(missing), misses=len(missing))
+        return vectors
+
+    def embed_query(self, text: str) -> Vector:
+        key = self.key(text)
+        [vector] = self.store.get_many([key])
+
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.store.set_many({key: vector})
+            self._count(misses=1)
+        else:
+            self._count(hits=1)
+
+        return vector
+
+    async def aembed_query(self, text: str) -> Vector:
+        key = self.key(text)
+        [vector] = await asyncio.to_thread(self.store.get_many, [key])
+
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            await asyncio.to_thread(self.store.set_many, {key: vector})
+            self._count(misses=1)
+        else:
+            self._count(hits=1)
+
+        return vector
+
+    def _count(self, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def build_embedding_store(settings) -> Optional[EmbeddingStore]:
+    if settings.embedding_cache_backend == "sqlite":
+        return SQLiteEmbeddingStore(settings.embedding_cache_path)
+    elif settings.embedding_cache_backend == "redis":
+        from app.chat.redis import binary_client
+
+        return RedisEmbeddingStore(binary_client, settings.embedding_cache_max_bytes)
+    elif settings.embedding_cache_backend in ("", "none"):
+        return None
+    else:
+        raise ValueError(
+            "Invalid embedding_cache_backend. Must be one of 'sqlite', 'redis', 'none'."
+        )
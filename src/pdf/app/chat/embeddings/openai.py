@@ -1,10 +1,30 @@
+from typing import Dict, Optional
+
+from app.chat.embeddings.cache import CachedEmbeddings, build_embedding_store
 from app.settings import get_settings
 from langchain_openai import OpenAIEmbeddings
 
 settings = get_settings()
 
-embeddings = OpenAIEmbeddings(
+openai_embeddings = OpenAIEmbeddings(
     openai_api_key=settings.openai_api_key,
     model=settings.text_embedding_model,
     dimensions=512,  # Match Pinecone index dimension
 )
+
+# Both ingestion (embed_documents) and retrieval (embed_query) go through
+# the cache, see embedding_cache_backend in the settings
+embedding_store = build_embedding_store(settings)
+
+embeddings = (
+    CachedEmbeddings(openai_embeddings, embedding_store)
+    if embedding_store
+    else openai_embeddings
+)
+
+
+def embedding_cache_stats() -> Optional[Dict[str, float]]:
+    """Hits and misses of this process's embedding cache, None without one."""
+    if isinstance(embeddings, CachedEmbeddings):
+        return embeddings.stats()
+    return None
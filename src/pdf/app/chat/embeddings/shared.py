@@ -0,0 +1,40 @@
+import asyncio
+from contextvars import ContextVar
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class SharedEmbedding:
+    """The question being answered and, once requested, its pending vector."""
+
+    def __init__(self, embeddings: Embeddings, text: str):
+        self.embeddings = embeddings
+        self.text = text
+        self.future: Optional[asyncio.Future] = None
+
+
+_shared: ContextVar[Optional[SharedEmbedding]] = ContextVar(
+    "shared_query_embedding", default=None
+)
+
+
+def share_query_embedding(embeddings: Embeddings, text: str) -> None:
+    """
+    Shares the embedding of `text` with the current task and the tasks
+    created from it afterwards (e.g. retrieval running next to the answer
+    cache lookup). Nothing is embedded yet: the first `aembed_query` for
+    the text starts the request and later ones await the same vector, so a
+    lookup that never happens costs nothing.
+    """
+    _shared.set(SharedEmbedding(embeddings, text))
+
+
+async def aembed_query(embeddings: Embeddings, text: str) -> List[float]:
+    shared = _shared.get()
+    if shared and shared.embeddings is embeddings and shared.text == text:
+        if shared.future is None:
+            shared.future = asyncio.ensure_future(embeddings.aembed_query(text))
+        # shielded, a cancelled retrieval must not cancel the other waiters
+        return await asyncio.shield(shared.future)
+    return await embeddings.aembed_query(text)
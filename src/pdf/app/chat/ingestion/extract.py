@@ -0,0 +1,129 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from app.settings import get_settings
+from app.text_splitter import TiktokenTextSplitter, get_encoding_for_model
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+settings = get_settings()
+
+PageRange = Tuple[int, int]
+
+
+def build_text_splitter():
+    return TiktokenTextSplitter(
+        chunk_size=settings.chunk_size_tokens,
+        chunk_overlap=settings.chunk_overlap_tokens,
+        encoding_name=get_encoding_for_model(settings.text_embedding_model).name,
+    )
+
+
+def count_pages(pdf_path: str) -> int:
+    return len(PdfReader(pdf_path).pages)
+
+
+def page_ranges(start: int, end: int, size: int) -> List[PageRange]:
+    """
+    Divides the pages [start, end) into contiguous (start, end) ranges of
+    at most `size` pages.
+
+    Example:
+
+        page_ranges(0, 10, 4) -> [(0, 4), (4, 8), (8, 10)]
+    """
+    size = max(1, size)
+    return [(page, min(page + size, end)) for page in range(start, end, size)]
+
+
+def iter_pages(reader: PdfReader, page_range: PageRange) -> Iterator[Document]:
+    """Lazily extracts the text of the given page range, one page at a time."""
+    start, end = page_range
+
+    for page in range(start, end):
+        yield Document(
+            page_content=reader.pages[page].extract_text(),
+            metadata={"page": page},
+        )
+
+
+def split_pages(reader: PdfReader, page_range: PageRange) -> Iterator[Document]:
+    text_splitter = build_text_splitter()
+    for page in iter_pages(reader, page_range):
+        yield from text_splitter.split_documents([page])
+
+
+# Opening a reader parses the whole page tree, so each pool worker opens
+# the pdf once and reuses the reader for every shard it is handed.
+_worker_reader: Optional[PdfReader] = None
+
+
+def _open_worker_reader(pdf_path: str) -> None:
+    global _worker_reader
+    _worker_reader = PdfReader(pdf_path)
+
+
+def _split_shard(page_range: PageRange) -> List[Document]:
+    return list(split_pages(_worker_reader, page_range))
+
+
+def _pool_context():
+    # Forked workers would inherit the parent's threads and locks (redis and
+    # http connection pools, celery) in whatever state they were in, so they
+    # start from a fresh interpreter instead. The fork server imports this
+    # module once, so workers forked from it skip importing the app again.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def iter_pdf_chunks(
+    pdf_path: str,
+    page_range: Optional[PageRange] = None,
+    workers: Optional[int] = None,
+) -> Iterator[Document]:
+    """
+    Streams the chunks of the given pdf in page order.
+
+    Pages are extracted and split one at a time. Large pdfs are sharded
+    into ranges of `ingestion_pages_per_shard` pages and processed across a
+    process pool with a bounded number of shards in flight, so buffered
+    chunks do not grow with the page count. Small pdfs, single worker
+    configurations and daemonic processes (which are not allowed to have
+    children, e.g. a prefork celery worker) extract in the current process.
+
+    :param pdf_path: The file path to the PDF.
+    :param page_range: Only extract the pages [start, end), defaults to all.
+    :param workers: Maximum number of processes, defaults to the
+        `ingestion_workers` setting.
+    """
+    reader = PdfReader(pdf_path)
+    start, end = page_range or (0, len(reader.pages))
+    workers = workers or settings.ingestion_workers
+    workers = min(workers, (end - start) // settings.ingestion_min_pages_per_worker)
+
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        yield from split_pages(reader, (start, end))
+        return
+
+    del reader
+    shards = page_ranges(start, end, settings.ingestion_pages_per_shard)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_pool_context(),
+        initializer=_open_worker_reader,
+        initargs=(pdf_path,),
+    ) as pool:
+        pending: Deque = deque()
+        for shard in shards:
+            pending.append(pool.submit(_split_shard, shard))
+            # futures are drained in submission order to keep page order
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,244 @@
+import logging
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import backoff
+from app.settings import get_settings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+Vector = Dict[str, Any]
+
+
+@dataclass
+class BatchTiming:
+    stage: str
+    batch: int
+    size: int
+    seconds: float
+    attempts: int
+
+
+@dataclass
+class IngestionReport:
+    timings: List[BatchTiming] = field(default_factory=list)
+    vectors: int = 0
+    seconds: float = 0.0
+    first_vector_seconds: Optional[float] = None
+
+    def stage_seconds(self, stage: str) -> float:
+        return sum(t.seconds for t in self.timings if t.stage == stage)
+
+    def as_dict(self):
+        return {
+            "vectors": self.vectors,
+            "seconds": self.seconds,
+            "first_vector_seconds": self.first_vector_seconds,
+            "embed_seconds": self.stage_seconds("embed"),
+            "upsert_seconds": self.stage_seconds("upsert"),
+            "batches": [t.__dict__ for t in self.timings],
+        }
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class IndexGroup:
+    """
+    Upserts every batch into each of the given indexes in turn, e.g.
+    pinecone and the local vector store.
+    """
+
+    def __init__(self, indexes: List[Any]):
+        self.indexes = indexes
+
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        for index in self.indexes:
+            index.upsert(vectors=vectors, namespace=namespace)
+        return {"upserted_count": len(vectors)}
+
+
+class IngestionPipeline:
+    """
+    Embeds documents and upserts the resulting vectors into an index.
+
+    Documents are consumed lazily in batches of `embed_batch_size`. At most
+    `concurrency` embedding batches are in flight, and finished batches are
+    handed to a separate pool that upserts them in slices of
+    `upsert_batch_size`, so the embedding of batch N+1 overlaps with the
+    upsert of batch N. Every batch is retried on its own with exponential
+    backoff and timed.
+
+    :param embeddings: Anything implementing `embed_documents`.
+    :param index: Anything implementing pinecone's `Index.upsert(vectors=...)`.
+
+    Example Usage:
+
+    report = IngestionPipeline(embeddings, index).run(docs)
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        index,
+        embed_batch_size: int = 64,
+        upsert_batch_size: int = 100,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        namespace: Optional[str] = None,
+    ):
+        self.embeddings = embeddings
+        self.index = index
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.namespace = namespace
+
+    def run(self, docs: Iterable[Document]) -> IngestionReport:
+        report = IngestionReport()
+        self._started = time.perf_counter()
+        self._upsert_batches = 0
+
+        embedding: Deque[Future] = deque()
+        upserting: Deque[Future] = deque()
+
+        with (
+            ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix="embed"
+            ) as embed_pool,
+            ThreadPoolExecutor(
+                self.concurrency, thread_name_prefix="upsert"
+            ) as upsert_pool,
+        ):
+            for number, batch in enumerate(batched(docs, self.embed_batch_size)):
+                embedding.append(embed_pool.submit(self._embed, number, batch))
+
+                while len(embedding) >= self.concurrency:
+                    self._hand_off(embedding.popleft(), upsert_pool, upserting, report)
+
+            while embedding:
+                self._hand_off(embedding.popleft(), upsert_pool, upserting, report)
+
+            while upserting:
+                self._finish_upsert(upserting.popleft(), report)
+
+        report.seconds = time.perf_counter() - self._started
+        logger.info(
+            "Ingested %s vectors in %.2fs (embed %.2fs, upsert %.2fs)",
+            report.vectors,
+            report.seconds,
+            report.stage_seconds("embed"),
+            report.stage_seconds("upsert"),
+        )
+        return report
+
+    def _hand_off(
+        self,
+        future: Future,
+        upsert_pool: ThreadPoolExecutor,
+        upserting: Deque[Future],
+        report: IngestionReport,
+    ) -> None:
+        vectors, timing = future.result()
+        report.timings.append(timing)
+
+        for batch in batched(vectors, self.upsert_batch_size):
+            upserting.append(
+                upsert_pool.submit(self._upsert, self._upsert_batches, batch)
+            )
+            self._upsert_batches += 1
+
+            while len(upserting) > self.concurrency:
+                self._finish_upsert(upserting.popleft(), report)
+
+    def _finish_upsert(self, future: Future, report: IngestionReport) -> None:
+        timing, finished = future.result()
+        report.timings.append(timing)
+        report.vectors += timing.size
+
+        first_vector_seconds = finished - self._started
+        if report.first_vector_seconds is None:
+            report.first_vector_seconds = first_vector_seconds
+        else:
+            report.first_vector_seconds = min(
+                report.first_vector_seconds, first_vector_seconds
+            )
+
+    def _embed(
+        self, number: int, docs: List[Document]
+    ) -> Tuple[List[Vector], BatchTiming]:
+        started = time.perf_counter()
+        values, attempts = self._with_retries(
+            self.embeddings.embed_documents, [doc.page_content for doc in docs]
+        )
+
+        vectors = [
+            {
+                "id": doc.id or str(uuid.uuid4()),
+                "values": value,
+                "metadata": doc.metadata,
+            }
+            for doc, value in zip(docs, values)
+        ]
+        timing = BatchTiming(
+            "embed", number, len(docs), time.perf_counter() - started, attempts
+        )
+        logger.debug(
+            "Embedded batch %s (%s docs) in %.3fs", number, len(docs), timing.seconds
+        )
+        return vectors, timing
+
+    def _upsert(self, number: int, vectors: List[Vector]) -> Tuple[BatchTiming, float]:
+        started = time.perf_counter()
+        _, attempts = self._with_retries(
+            lambda: self.index.upsert(vectors=vectors, namespace=self.namespace)
+        )
+        finished = time.perf_counter()
+
+        timing = BatchTiming(
+            "upsert", number, len(vectors), finished - started, attempts
+        )
+        logger.debug(
+            "Upserted batch %s (%s vectors) in %.3fs",
+            number,
+            len(vectors),
+            timing.seconds,
+        )
+        return timing, finished
+
+    def _with_retries(self, fn: Callable, *args) -> Tuple[Any, int]:
+        attempts = 0
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1
+            return fn(*args)
+
+        retrying = backoff.on_exception(
+            backoff.expo, Exception, max_tries=self.max_retries, logger=logger
+        )(attempt)
+        return retrying(), attempts
+
+
+def build_ingestion_pipeline(embeddings: Embeddings, index) -> IngestionPipeline:
+    return IngestionPipeline(
+        embeddings=embeddings,
+        index=index,
+        embed_batch_size=settings.embed_batch_size,
+        upsert_batch_size=settings.upsert_batch_size,
+        concurrency=settings.ingestion_concurrency,
+        max_retries=settings.ingestion_max_retries,
+    )
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Iterator, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    Thread safe mapping that holds at most `max_size` entries, dropping the
+    least recently used one first. With a `ttl` entries also expire that
+    many seconds after they were set.
+
+    :param on_evict: Called with (key, value) for every entry dropped to
+        make room or because it expired, e.g. to close a client.
+
+    Example Usage:
+
+    cache = LRUCache(max_size=128, ttl=300)
+    cache.set("key", value)
+    cache.get("key")
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable, V], None]] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def _expired(self, set_at: float) -> bool:
+        return self.ttl is not None and time.monotonic() - set_at > self.ttl
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            if self._expired(entry[0]):
+                del self._entries[key]
+                evicted = [(key, entry[1])]
+            else:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        self._evicted(evicted)
+        return None
+
+    def set(self, key: Hashable, value: V) -> None:
+        evicted = []
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                old_key, (_, old_value) = self._entries.popitem(last=False)
+                evicted.append((old_key, old_value))
+
+        self._evicted(evicted)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], V]) -> V:
+        """Returns the cached value, creating and caching it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def items(self) -> Iterator[Tuple[Hashable, V]]:
+        with self._lock:
+            entries = list(self._entries.items())
+        return ((key, value) for key, (_, value) in entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evicted(self, entries) -> None:
+        if self.on_evict:
+            for key, value in entries:
+                self.on_evict(key, value)
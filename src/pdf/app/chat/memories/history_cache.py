@@ -0,0 +1,160 @@
+import json
+import logging
+from typing import Callable, List, Optional, Sequence
+
+import redis
+from app.chat.lru import LRUCache
+from langchain_core.messages import (
+    BaseMessage,
+    message_to_dict,
+    messages_from_dict,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryCache:
+    """
+    Read-through cache of converted conversation histories, kept in a
+    per-process LRU and, with a redis `client`, in a redis list shared by
+    all workers. New messages are appended to the cached history rather
+    than invalidating it.
+
+    The database stays the source of truth. Every read first counts the
+    conversation's messages, a single COUNT query, and a cached history is
+    only used if it holds exactly that many messages. So a worker whose
+    copy is behind, because another worker answered the last turn, falls
+    back to redis or reloads instead of serving a stale history. This
+    relies on messages only ever being added, never edited or deleted.
+
+    :param count: Returns the number of stored messages of a conversation.
+    :param load: Returns all stored messages of a conversation, in order.
+    """
+
+    def __init__(
+        self,
+        count: Callable[[str], int],
+        load: Callable[[str], List[BaseMessage]],
+        max_size: int = 1024,
+        ttl: int = 60 * 60,
+        client: Optional[redis.Redis] = None,
+        prefix: str = "history_cache",
+    ):
+        self.count = count
+        self.load = load
+        self.ttl = ttl
+        self.client = client
+        self.prefix = prefix
+        self._local: LRUCache[List[BaseMessage]] = LRUCache(max_size, ttl=ttl)
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.prefix}:{conversation_id}"
+
+    def read(self, conversation_id: str) -> List[BaseMessage]:
+        count = self.count(conversation_id)
+
+        messages = self._local.get(conversation_id)
+        if messages is not None and len(messages) == count:
+            return list(messages)
+
+        messages = self._read_shared(conversation_id, count)
+        if messages is None:
+            messages = self.load(conversation_id)
+            self._write_shared(conversation_id, messages)
+
+        self._local.set(conversation_id, messages)
+        return list(messages)
+
+    def append(
+        self, conversation_id: str, messages: Sequence[BaseMessage], count: int
+    ) -> None:
+        """
+        Appends messages that were just stored, `count` being the number of
+        stored messages including them.
+        """
+        if not messages:
+            return
+
+        previous = count - len(messages)
+        cached = self._local.get(conversation_id)
+        if cached is not None and len(cached) == previous:
+            # a new list, readers may still hold the old one
+            self._local.set(conversation_id, [*cached, *messages])
+        else:
+            self._local.pop(conversation_id)
+
+        if self.client is None:
+            return
+
+        key = self._key(conversation_id)
+        values = [_serialize(message) for message in messages]
+
+        # appends only if the shared list is exactly as long as the history
+        # was before, otherwise it is dropped and rebuilt on the next read
+        def append(pipeline) -> None:
+            length = pipeline.llen(key)
+            pipeline.multi()
+            if length == previous:
+                pipeline.rpush(key, *values)
+                pipeline.expire(key, self.ttl)
+            else:
+                pipeline.delete(key)
+
+        try:
+            # retried if another worker changes the list in between
+            self.client.transaction(append, key)
+        except redis.RedisError:
+            logger.warning("Could not append to the history cache", exc_info=True)
+
+    def _read_shared(
+        self, conversation_id: str, count: int
+    ) -> Optional[List[BaseMessage]]:
+        if self.client is None:
+            return None
+        try:
+            cached = self.client.lrange(self._key(conversation_id), 0, -1)
+        except redis.RedisError:
+            logger.warning("History cache unavailable", exc_info=True)
+            return None
+
+        if len(cached) != count or not cached:
+            return None
+        return messages_from_dict([json.loads(message) for message in cached])
+
+    def _write_shared(self, conversation_id: str, messages: List[BaseMessage]) -> None:
+        if self.client is None:
+            return
+
+        key = self._key(conversation_id)
+        try:
+            pipeline = self.client.pipeline()
+            pipeline.delete(key)
+            if messages:
+                pipeline.rpush(key, *map(_serialize, messages))
+                pipeline.expire(key, self.ttl)
+            pipeline.execute()
+        except redis.RedisError:
+            logger.warning("Could not fill the history cache", exc_info=True)
+
+
+def _serialize(message: BaseMessage) -> str:
+    return json.dumps(message_to_dict(message))
+
+
+def build_history_cache(settings, count, load) -> Optional[HistoryCache]:
+    options = {
+        "max_size": settings.history_cache_size,
+        "ttl": settings.history_cache_ttl,
+    }
+    if settings.history_cache_backend == "local":
+        return HistoryCache(count, load, **options)
+    elif settings.history_cache_backend == "redis":
+        from app.chat.redis import client
+
+        return HistoryCache(count, load, client=client, **options)
+    elif settings.history_cache_backend in ("", "none"):
+        return None
+    else:
+        raise ValueError(
+            "Invalid history_cache_backend. Must be one of 'local', 'redis', 'none'."
+        )
@@ -1,27 +1,108 @@
-from typing import List
+import asyncio
+from functools import partial
+from typing import List, Optional, Sequence
 
-from app.web.api import add_message_to_conversation, get_messages_by_conversation_id
+from app.chat.context import MESSAGE_OVERHEAD_TOKENS
+from app.chat.memories.history_cache import build_history_cache
+from app.settings import get_settings
+from app.text_splitter import get_encoding_for_model
+from app.web.api import (
+    add_message_to_conversation,
+    add_messages_to_conversation,
+    count_messages_by_conversation_id,
+    get_messages_by_conversation_id,
+    iter_recent_messages_by_conversation_id,
+)
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage
 
+settings = get_settings()
+
+# Converted histories, see history_cache_backend in the settings
+history_cache = build_history_cache(
+    settings, count_messages_by_conversation_id, get_messages_by_conversation_id
+)
+
 
 class SQLMessageHistory(BaseChatMessageHistory):
     def __init__(self, conversation_id: str):
         self.conversation_id = conversation_id
 
     def add_message(self, message) -> None:
-        return add_message_to_conversation(
+        stored = add_message_to_conversation(
             self.conversation_id, message.type, message.content
         )
+        self._cache_appended([message])
+        return stored
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        add_messages_to_conversation(self.conversation_id, list(messages))
+        self._cache_appended(messages)
+
+    def _cache_appended(self, messages: Sequence[BaseMessage]) -> None:
+        if history_cache:
+            history_cache.append(
+                self.conversation_id,
+                messages,
+                count_messages_by_conversation_id(self.conversation_id),
+            )
 
     @property
     def messages(self) -> List[BaseMessage]:
+        if history_cache:
+            return history_cache.read(self.conversation_id)
         return get_messages_by_conversation_id(self.conversation_id)
 
+    # asyncio.to_thread carries the flask app context over to the thread
+    async def aget_messages(self) -> List[BaseMessage]:
+        return await asyncio.to_thread(lambda: self.messages)
+
+    async def aadd_messages(self, messages: Sequence[BaseMessage]) -> None:
+        await asyncio.to_thread(self.add_messages, messages)
+
     def clear(self) -> None:
         pass
 
 
+class WindowedSQLMessageHistory(SQLMessageHistory):
+    """
+    SQL history that only loads the most recent messages: the last `k`
+    messages, and of those as many as fit into `max_tokens`. Messages are
+    read newest first from the (conversation_id, created_on) index and
+    reading stops at the window, so the cost of a load does not grow with
+    the length of the conversation.
+    """
+
+    def __init__(
+        self,
+        conversation_id: str,
+        k: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ):
+        super().__init__(conversation_id)
+        self.k = k
+        self.max_tokens = max_tokens
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        recent = iter_recent_messages_by_conversation_id(
+            self.conversation_id, limit=self.k
+        )
+        if self.max_tokens is not None:
+            recent = self._within_tokens(recent)
+        return list(reversed(list(recent)))
+
+    def _within_tokens(self, messages):
+        encoding = get_encoding_for_model(settings.model)
+        used = 0
+        for message in messages:
+            used += len(encoding.encode_ordinary(str(message.content)))
+            used += MESSAGE_OVERHEAD_TOKENS
+            if used > self.max_tokens:
+                return
+            yield message
+
+
 def build_sql_memory(chat_args):
     """Returns SQL session history function for RunnableWithMessageHistory."""
 
@@ -31,7 +112,24 @@ def build_sql_memory(chat_args):
     return get_session_history
 
 
+def build_windowed_sql_memory(
+    chat_args, k: Optional[int] = None, max_tokens: Optional[int] = None
+):
+    """Returns a session history function that loads only recent messages."""
+
+    def get_session_history(conversation_id: str) -> WindowedSQLMessageHistory:
+        return WindowedSQLMessageHistory(
+            conversation_id=conversation_id, k=k, max_tokens=max_tokens
+        )
+
+    return get_session_history
+
+
 # SQL memory registry
 sql_memory_registry = {
     "sql_memory": build_sql_memory,
+    "sql_window_memory": partial(build_windowed_sql_memory, k=10),
+    "sql_token_window_memory": partial(
+        build_windowed_sql_memory, k=50, max_tokens=2000
+    ),
 }
@@ -1,50 +1,161 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
 from functools import partial
-from typing import Dict, List
+from typing import Deque, List, Sequence
 
+from app.chat.lru import LRUCache
+from app.settings import get_settings
 from langchain_core.chat_history import BaseChatMessageHistory
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
 
-# Global store to persist window memories across requests
-_window_memory_store: Dict[str, "WindowMessageHistory"] = {}
+settings = get_settings()
+
+
+class WindowStore(ABC):
+    """Keeps the last `k` messages per key, dropping older ones on append."""
+
+    @abstractmethod
+    def get(self, key: str, k: int) -> List[BaseMessage]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def append(self, key: str, k: int, messages: Sequence[BaseMessage]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalWindowStore(WindowStore):
+    """
+    Per-process store, a `deque(maxlen=k)` per conversation. At most
+    `max_conversations` are kept, the least recently used are dropped
+    first, and conversations untouched for `ttl` seconds expire.
+    """
+
+    def __init__(self, max_conversations: int, ttl: float):
+        self._windows: LRUCache[Deque[BaseMessage]] = LRUCache(
+            max_conversations, ttl=ttl
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str, k: int) -> List[BaseMessage]:
+        # copied under the lock, a concurrent append would break iteration
+        with self._lock:
+            window = self._windows.get(key)
+            return list(window) if window is not None else []
+
+    def append(self, key: str, k: int, messages: Sequence[BaseMessage]) -> None:
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = deque(maxlen=k)
+            window.extend(messages)
+            # set again to restart the ttl
+            self._windows.set(key, window)
+
+    def clear(self, key: str) -> None:
+        self._windows.pop(key)
+
+
+class RedisWindowStore(WindowStore):
+    """
+    Store shared by all workers, a redis list per conversation holding the
+    newest message first. Appends LPUSH and LTRIM to `k` in one
+    transaction, and untouched conversations expire after `ttl` seconds.
+    """
+
+    def __init__(self, client, ttl: int, prefix: str = "window_memory"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str, k: int) -> List[BaseMessage]:
+        newest_first = self.client.lrange(self._key(key), 0, k - 1)
+        return messages_from_dict(
+            [json.loads(message) for message in reversed(newest_first)]
+        )
+
+    def append(self, key: str, k: int, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+
+        key = self._key(key)
+        pipeline = self.client.pipeline()
+        pipeline.lpush(key, *(json.dumps(message_to_dict(m)) for m in messages))
+        pipeline.ltrim(key, 0, k - 1)
+        pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+    def clear(self, key: str) -> None:
+        self.client.delete(self._key(key))
 
 
 class WindowMessageHistory(BaseChatMessageHistory):
-    """In-memory message history that keeps only the last k messages."""
+    """Message history that keeps only the last k messages."""
 
-    def __init__(self, conversation_id: str, k: int = 5):
+    def __init__(self, conversation_id: str, store: WindowStore, k: int = 5):
         self.conversation_id = conversation_id
+        self.store = store
         self.k = k
-        self._messages: List[BaseMessage] = []
+
+    @property
+    def _key(self) -> str:
+        return f"{self.conversation_id}_{self.k}"
 
     @property
     def messages(self) -> List[BaseMessage]:
         """Return the last k messages."""
-        return self._messages[-self.k :]
+        return self.store.get(self._key, self.k)
 
     def add_message(self, message: BaseMessage) -> None:
         """Add a message to the store."""
-        self._messages.append(message)
+        self.store.append(self._key, self.k, [message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        self.store.append(self._key, self.k, list(messages))
 
     def clear(self) -> None:
         """Clear all messages."""
-        self._messages = []
+        self.store.clear(self._key)
+
+
+def build_window_store(settings) -> WindowStore:
+    if settings.window_memory_backend == "local":
+        return LocalWindowStore(
+            settings.window_memory_max_conversations, settings.window_memory_ttl
+        )
+    elif settings.window_memory_backend == "redis":
+        from app.chat.redis import client
+
+        return RedisWindowStore(client, settings.window_memory_ttl)
+    else:
+        raise ValueError(
+            "Invalid window_memory_backend. Must be one of 'local', 'redis'."
+        )
+
+
+# Shared by every conversation, see window_memory_backend in the settings
+window_store = build_window_store(settings)
 
 
 def build_window_memory(chat_args, k: int = 5):
     """Returns window history function that persists across requests."""
 
     def history_func(conversation_id: str) -> WindowMessageHistory:
-        # Check if we already have a history for this conversation
-        key = f"{conversation_id}_{k}"
-        if key not in _window_memory_store:
-            _window_memory_store[key] = WindowMessageHistory(
-                conversation_id=conversation_id, k=k
-            )
-        return _window_memory_store[key]
+        return WindowMessageHistory(
+            conversation_id=conversation_id, store=window_store, k=k
+        )
 
     return history_func
 
 
 window_memory_registry = {
     "window_memory": partial(build_window_memory, k=5),  # Default with 5 messages
-}
\ No newline at end of file
+}
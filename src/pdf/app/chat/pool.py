@@ -0,0 +1,39 @@
+from typing import Callable, Dict, Hashable, Optional
+
+from app.chat.lru import LRUCache
+from app.chat.models import ChatArgs
+from app.settings import get_settings
+
+settings = get_settings()
+
+# What makes a constructed component reusable by another request. LLM
+# clients only differ by model and streaming, retrievers are bound to a pdf.
+# Memories are cheap closures and are not pooled.
+pool_keys: Dict[str, Callable[[str, ChatArgs], Hashable]] = {
+    "llm": lambda name, chat_args: (name, chat_args.streaming),
+    "retriever": lambda name, chat_args: (name, chat_args.pdf_id),
+}
+
+pools: Dict[str, LRUCache] = {
+    "llm": LRUCache(max_size=settings.llm_pool_size),
+    "retriever": LRUCache(max_size=settings.retriever_pool_size),
+}
+
+
+def build_component(
+    component_registry, component_type: str, name: str, chat_args: ChatArgs
+):
+    """
+    Returns the component `name` from the registry, reusing one constructed
+    for an earlier request where possible. Pools are bounded and drop the
+    least recently used component first, a pool size of 0 disables pooling.
+
+    Reusing LLM clients keeps their HTTP connections alive across requests
+    instead of opening a new connection pool per message.
+    """
+    pool: Optional[LRUCache] = pools.get(component_type)
+    if pool is None or pool.max_size <= 0:
+        return component_registry[name](chat_args)
+
+    key = (id(component_registry), pool_keys[component_type](name, chat_args))
+    return pool.get_or_set(key, lambda: component_registry[name](chat_args))
@@ -3,4 +3,7 @@ from app.settings import get_settings
 
 settings = get_settings()
 
-client = redis.Redis.from_url(settings.redis_uri, decode_responses=True)
\ No newline at end of file
+client = redis.Redis.from_url(settings.redis_uri, decode_responses=True)
+
+# Client for raw binary values (e.g. packed vectors), which must not be decoded
+binary_client = redis.Redis.from_url(settings.redis_uri)
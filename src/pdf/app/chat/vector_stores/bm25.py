@@ -0,0 +1,183 @@
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+from app.chat.lru import LRUCache
+from app.settings import get_settings
+from app.web.api import iter_chunks_by_pdf_id
+
+settings = get_settings()
+
+# Identifiers like "4.2.1", "ERR-404" or "A/B" are kept whole, and also
+# indexed by their parts
+TOKEN_RE = re.compile(r"\w+(?:[.\-/:]\w+)*")
+PART_RE = re.compile(r"[.\-/:]")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+@dataclass
+class BM25Index:
+    """
+    Inverted index over the chunks of one pdf, with postings kept in flat
+    arrays: the postings of term t are `doc_ids[offsets[t]:offsets[t + 1]]`
+    with the matching `term_freqs`.
+    """
+
+    terms: Dict[str, int]
+    offsets: np.ndarray
+    doc_ids: np.ndarray
+    term_freqs: np.ndarray
+    doc_lengths: np.ndarray
+    chunk_ids: np.ndarray
+    pages: np.ndarray
+
+    @classmethod
+    def build(cls, chunks: Iterable[Tuple[str, Optional[int], str]]) -> "BM25Index":
+        """:param chunks: (chunk id, page, text) of every chunk of the pdf"""
+        chunk_ids, pages, doc_lengths = [], [], []
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+
+        for doc, (chunk_id, page, text) in enumerate(chunks):
+            counts = Counter(tokenize(text))
+            chunk_ids.append(chunk_id)
+            pages.append(-1 if page is None else page)
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc, count))
+
+        terms = sorted(postings)
+        lengths = [len(postings[term]) for term in terms]
+        flat = [posting for term in terms for posting in postings[term]]
+
+        return cls(
+            terms={term: number for number, term in enumerate(terms)},
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            doc_ids=np.array([doc for doc, _ in flat], dtype=np.int32),
+            term_freqs=np.array([count for _, count in flat], dtype=np.float32),
+            doc_lengths=np.array(doc_lengths, dtype=np.float32),
+            chunk_ids=np.array(chunk_ids, dtype=str),
+            pages=np.array(pages, dtype=np.int32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def search(
+        self, query: str, k: int = 4, k1: float = 1.2, b: float = 0.75
+    ) -> List[Tuple[str, int, float]]:
+        """Returns the (chunk id, page, score) of the k best scoring chunks."""
+        if not len(self):
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        average_length = self.doc_lengths.mean() or 1.0
+        for term in set(tokenize(query)):
+            number = self.terms.get(term)
+            if number is None:
+                continue
+
+            start, end = self.offsets[number], self.offsets[number + 1]
+            docs = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end]
+            idf = np.log1p((len(self) - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = k1 * (1 - b + b * self.doc_lengths[docs] / average_length)
+            # every doc appears once per term, so plain fancy indexing is safe
+            scores[docs] += idf * freqs * (k1 + 1) / (freqs + norm)
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (str(self.chunk_ids[i]), int(self.pages[i]), float(scores[i])) for i in top
+        ]
+
+    def save(self, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.array(sorted(self.terms, key=self.terms.get), dtype=str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            chunk_ids=self.chunk_ids,
+            pages=self.pages,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            return cls(
+                terms={str(term): number for number, term in enumerate(data["terms"])},
+                offsets=data["offsets"],
+                doc_ids=data["doc_ids"],
+                term_freqs=data["term_freqs"],
+                doc_lengths=data["doc_lengths"],
+                chunk_ids=data["chunk_ids"],
+                pages=data["pages"],
+            )
+
+
+def index_path(pdf_id: str) -> str:
+    return os.path.join(settings.bm25_index_dir, f"{quote(str(pdf_id), safe='')}.npz")
+
+
+def build_bm25_index(pdf_id: str) -> BM25Index:
+    """Indexes the chunks of a pdf from the chunk store and saves the index."""
+    index = BM25Index.build(iter_chunks_by_pdf_id(pdf_id))
+
+    os.makedirs(settings.bm25_index_dir, exist_ok=True)
+    index.save(index_path(pdf_id))
+    return index
+
+
+class BM25IndexCache:
+    """
+    Least recently used cache of loaded indexes. An index is reloaded when
+    its file changed (the pdf was re-ingested) and built from the chunk
+    store when there is no file yet.
+    """
+
+    def __init__(self, max_size: int):
+        # pdf_id -> (mtime of the index file, index)
+        self._indexes: LRUCache[Tuple[float, BM25Index]] = LRUCache(max_size)
+
+    def get(self, pdf_id: str) -> BM25Index:
+        path = index_path(pdf_id)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+
+        cached = self._indexes.get(pdf_id)
+        if cached and mtime is not None and cached[0] == mtime:
+            return cached[1]
+
+        if mtime is None:
+            index = build_bm25_index(pdf_id)
+            mtime = os.stat(path).st_mtime
+        else:
+            index = BM25Index.load(path)
+
+        self._indexes.set(pdf_id, (mtime, index))
+        return index
+
+
+bm25_indexes = BM25IndexCache(settings.bm25_cache_size)
@@ -0,0 +1,39 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List
+
+from app.web.api import get_chunk_contents_by_ids
+from langchain_core.documents import Document
+
+
+@dataclass
+class Match:
+    """A search result in the shape of a pinecone match."""
+
+    id: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    values: List[float] = field(default_factory=list)
+
+
+def hydrate_matches(matches: Iterable) -> List[Document]:
+    """
+    Turns vector index matches (anything with `id`, `score` and `metadata`)
+    into documents, fetching the text of every chunk in one bulk lookup.
+
+    Vectors indexed before the chunk store existed carry their text in the
+    `text` metadata field, which is used as a fallback.
+    """
+    matches = list(matches)
+    contents = get_chunk_contents_by_ids([match.id for match in matches])
+
+    docs = []
+    for match in matches:
+        metadata = dict(match.metadata or {})
+        content = contents.get(match.id, metadata.pop("text", None))
+        if content is None:
+            continue
+
+        metadata["score"] = match.score
+        docs.append(Document(id=match.id, page_content=content, metadata=metadata))
+
+    return docs
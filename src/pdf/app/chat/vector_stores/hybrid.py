@@ -0,0 +1,149 @@
+import asyncio
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Dict, List
+
+from app.chat.embeddings.shared import aembed_query
+from app.chat.models import ChatArgs
+from app.chat.vector_stores.bm25 import bm25_indexes
+from app.chat.vector_stores.chunk_store import Match, hydrate_matches
+from app.chat.vector_stores.pinecone import PineconeRetriever, build_retriever
+from app.chat.vector_stores.retrieval_cache import DEGRADED
+from app.settings import get_settings
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+# Vector searches that miss the deadline keep running here in the
+# background, they are only no longer waited for
+_vector_pool = ThreadPoolExecutor(thread_name_prefix="hybrid-vector")
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[Document]], k: int, rrf_k: int = 60
+) -> List[Document]:
+    """
+    Merges rankings by summing 1 / (rrf_k + rank) per document id, which
+    needs no calibration between BM25 and cosine scores.
+    """
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            scores[doc.id] = scores.get(doc.id, 0.0) + 1.0 / (rrf_k + rank + 1)
+            docs.setdefault(doc.id, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs[id] for id in ranked]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 keyword search over the pdf's chunks with vector search, so
+    exact identifiers (clause numbers, part numbers, error codes) are found
+    even when the embedding misses them.
+
+    BM25 runs locally while the query is embedded. If the embedding and
+    the vector search have not both answered within `deadline` seconds of
+    starting the embedding, so also when OpenAI is slow or retrying, the
+    BM25 results are returned on their own, marked with the `DEGRADED`
+    metadata flag so they are not cached.
+    """
+
+    vector_retriever: PineconeRetriever
+    pdf_id: str
+    k: int
+    deadline: float
+
+    def _keyword_search(self, query: str) -> List[Document]:
+        results = bm25_indexes.get(self.pdf_id).search(query, k=self.k * 2)
+        return hydrate_matches(
+            Match(id=id, score=score, metadata={"pdf_id": self.pdf_id, "page": page})
+            for id, page, score in results
+        )
+
+    def _fuse(self, keyword: List[Document], vector: List[Document]) -> List[Document]:
+        return reciprocal_rank_fusion([vector, keyword], k=self.k)
+
+    def _remaining(self, started: float) -> float:
+        return max(0.0, self.deadline - (time.monotonic() - started))
+
+    def _keyword_only(self, keyword: List[Document]) -> List[Document]:
+        logger.warning("Vector search past %ss, using BM25 only", self.deadline)
+        docs = keyword[: self.k]
+        for doc in docs:
+            doc.metadata[DEGRADED] = True
+        return docs
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.monotonic()
+        # the copied context carries the flask app context into the thread
+        context = contextvars.copy_context()
+        embedding = _vector_pool.submit(
+            context.run, self.vector_retriever.embeddings.embed_query, query
+        )
+        keyword = self._keyword_search(query)
+
+        # one deadline for the embedding and the search together
+        try:
+            vector = embedding.result(timeout=self._remaining(started))
+            search = _vector_pool.submit(
+                context.run, self.vector_retriever.search_by_vector, vector
+            )
+            vector = search.result(timeout=self._remaining(started))
+        except FutureTimeoutError:
+            return self._keyword_only(keyword)
+
+        return self._fuse(keyword, vector)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        started = time.monotonic()
+        embedding = asyncio.ensure_future(
+            aembed_query(self.vector_retriever.embeddings, query)
+        )
+        keyword = await asyncio.to_thread(self._keyword_search, query)
+
+        async def vector_search() -> List[Document]:
+            return await asyncio.to_thread(
+                self.vector_retriever.search_by_vector, await embedding
+            )
+
+        # one deadline for the embedding and the search together
+        try:
+            vector = await asyncio.wait_for(
+                vector_search(), timeout=self._remaining(started)
+            )
+        except asyncio.TimeoutError:
+            return self._keyword_only(keyword)
+
+        return self._fuse(keyword, vector)
+
+
+def build_hybrid_retriever(chat_args: ChatArgs, k: int) -> HybridRetriever:
+    return HybridRetriever(
+        # over-fetch so fusion has candidates from both sides to choose from
+        vector_retriever=build_retriever(chat_args, k=k * 2),
+        pdf_id=chat_args.pdf_id,
+        k=k,
+        deadline=settings.hybrid_vector_deadline,
+    )
+
+
+hybrid_retriever_registry = {
+    "hybrid_4": partial(build_hybrid_retriever, k=4),
+}
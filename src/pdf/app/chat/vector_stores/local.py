@@ -0,0 +1,384 @@
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+import numpy as np
+from app.chat.embeddings.openai import embeddings
+from app.chat.models import ChatArgs
+from app.chat.vector_stores.chunk_store import Match
+from app.chat.vector_stores.pinecone import PineconeRetriever
+from app.settings import get_settings
+from langchain_core.embeddings import Embeddings
+
+settings = get_settings()
+
+# Rows upcast to float32 at a time when scoring int8 or float16 segments
+SCORE_BLOCK_ROWS = 1024
+
+
+@dataclass
+class QueryResponse:
+    matches: List[Match]
+    namespace: str = ""
+
+
+@dataclass
+class Segment:
+    """
+    One upserted batch: a memory-mapped matrix plus its ids and metadata.
+
+    Quantized segments hold int8 `vectors` with a float32 scale per row and
+    keep float16 rows in `full`, which are only read for the candidates
+    being rescored.
+    """
+
+    vectors: np.ndarray
+    ids: List[str]
+    metadata: List[Dict[str, Any]]
+    scales: Optional[np.ndarray] = None
+    full: Optional[np.ndarray] = None
+
+    @property
+    def quantized(self) -> bool:
+        return self.scales is not None
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        if self.vectors.dtype == np.float32:
+            return np.asarray(self.vectors @ query)
+
+        # a product with the whole matrix would upcast a float32 copy of it,
+        # instead rows are upcast into one bounded buffer a block at a time
+        scores = np.empty(len(self.ids), dtype=np.float32)
+        rows = max(1, min(SCORE_BLOCK_ROWS, len(scores)))
+        buffer = np.empty((rows, self.vectors.shape[1]), dtype=np.float32)
+        for start in range(0, len(scores), rows):
+            block = self.vectors[start : start + rows]
+            np.copyto(buffer[: len(block)], block)
+            np.matmul(
+                buffer[: len(block)], query, out=scores[start : start + len(block)]
+            )
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def values(self, row: int) -> np.ndarray:
+        vectors = self.full if self.full is not None else self.vectors
+        return np.asarray(vectors[row], dtype=np.float32)
+
+
+def quantize(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric int8 quantization with one scale per row, so that
+    `quantized[i] * scales[i]` approximates `matrix[i]`.
+    """
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _pdf_id_from_filter(filter: Optional[Dict[str, Any]]) -> str:
+    condition = (filter or {}).get("pdf_id")
+    if isinstance(condition, dict):
+        condition = condition.get("$eq")
+    if condition is None:
+        raise ValueError("Local vector store queries must filter on a single pdf_id")
+    return str(condition)
+
+
+def _matches_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class LocalVectorStore:
+    """
+    Brute force cosine search over vectors kept on local disk, partitioned
+    by `pdf_id`.
+
+    Each upserted batch is written as a segment in the pdf's directory: a
+    `.npy` matrix of unit length rows (float32, or float16 to halve the
+    size) and a `.json` file with the ids and metadata. Segments are
+    memory-mapped on first use and a query is one matrix-vector product per
+    segment, so a pdf with a few hundred chunks is searched in well under a
+    millisecond without a network round trip.
+
+    With `dtype="int8"` the scanned matrix is quantized to a quarter of the
+    float32 size (plus a `.scale.npy` with one float per row). The top
+    `top_k * rescore` candidates of the int8 scores are then rescored
+    against float16 rows kept in a `.full.npy` file next to it, which stays
+    on disk apart from the few rows read per query. A segment takes three
+    quarters of its float32 size on disk in all.
+
+    Only float32 segments are ranked exactly. float16 rows, scanned or
+    rescored, round each component to about three significant digits, so
+    scores are off by up to ~4e-5 (512 dimensions) and near ties may swap
+    places.
+
+    Implements the subset of pinecone's `Index` the app uses (`upsert`,
+    `query`, `delete`), so it can be written to by the ingestion pipeline.
+
+    Example Usage:
+
+    store = LocalVectorStore("vector_store", embeddings)
+    retriever = store.as_retriever(search_kwargs={"filter": {"pdf_id": "123"}, "k": 4})
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embeddings: Optional[Embeddings] = None,
+        dtype: str = "float32",
+        max_segments: int = 4096,
+        rescore: int = 4,
+    ):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(
+                "Invalid dtype. Must be one of 'float32', 'float16', 'int8'."
+            )
+
+        self.directory = directory
+        self.embeddings = embeddings
+        self.dtype = np.dtype(dtype)
+        self.rescore = rescore
+        # segment names are derived from their contents, so a cached
+        # segment never goes stale
+        self._load_segment = lru_cache(maxsize=max_segments)(self._read_segment)
+
+    def _partition(self, pdf_id: str) -> str:
+        return os.path.join(self.directory, quote(str(pdf_id), safe=""))
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace=None) -> Dict[str, int]:
+        partitions: Dict[str, List[Dict[str, Any]]] = {}
+        for vector in vectors:
+            partitions.setdefault(str(vector["metadata"]["pdf_id"]), []).append(vector)
+
+        for pdf_id, batch in partitions.items():
+            self._write_segment(pdf_id, batch)
+
+        return {"upserted_count": len(vectors)}
+
+    def _write_segment(self, pdf_id: str, batch: List[Dict[str, Any]]) -> None:
+        directory = self._partition(pdf_id)
+        os.makedirs(directory, exist_ok=True)
+
+        ids = [vector["id"] for vector in batch]
+        # a retried batch maps to the same segment and overwrites it
+        name = hashlib.sha1("\n".join(ids).encode()).hexdigest()
+        path = os.path.join(directory, name)
+
+        matrix = np.asarray([vector["values"] for vector in batch], dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+        record = {"ids": ids, "metadata": [vector["metadata"] for vector in batch]}
+
+        # the .npy file is written last, its presence marks a complete segment
+        _atomic_write(f"{path}.json", lambda f: f.write(json.dumps(record).encode()))
+        if self.dtype == np.int8:
+            quantized, scales = quantize(matrix)
+            _atomic_write(f"{path}.scale.npy", lambda f: np.save(f, scales))
+            _atomic_write(
+                f"{path}.full.npy", lambda f: np.save(f, matrix.astype(np.float16))
+            )
+            _atomic_write(f"{path}.npy", lambda f: np.save(f, quantized))
+        else:
+            _atomic_write(
+                f"{path}.npy", lambda f: np.save(f, matrix.astype(self.dtype))
+            )
+
+    def _read_segment(self, path: str) -> Segment:
+        with open(f"{path}.json") as f:
+            record = json.load(f)
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        # the format is read from the file, partitions may mix dtypes
+        quantized = vectors.dtype == np.int8
+        return Segment(
+            vectors=vectors,
+            ids=record["ids"],
+            metadata=record["metadata"],
+            scales=np.load(f"{path}.scale.npy") if quantized else None,
+            full=np.load(f"{path}.full.npy", mmap_mode="r") if quantized else None,
+        )
+
+    def _segment_paths(self, directory: str) -> List[str]:
+        try:
+            names = sorted(
+                name
+                for name in os.listdir(directory)
+                if name.endswith(".npy") and name.count(".") == 1
+            )
+        except FileNotFoundError:
+            return []
+        return [os.path.join(directory, name[:-4]) for name in names]
+
+    def segments(self, pdf_id: str) -> List[Segment]:
+        return [
+            self._load_segment(path)
+            for path in self._segment_paths(self._partition(pdf_id))
+        ]
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = False,
+        include_metadata: bool = False,
+        namespace=None,
+    ) -> QueryResponse:
+        segments = self.segments(_pdf_id_from_filter(filter))
+        if not segments or top_k <= 0:
+            return QueryResponse(matches=[])
+
+        query = np.asarray(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        scores = np.concatenate([segment.scores(query) for segment in segments])
+        offsets = np.cumsum([0] + [len(segment.ids) for segment in segments])
+
+        extra_filter = {key: value for key, value in filter.items() if key != "pdf_id"}
+        if extra_filter:
+            for segment, offset in zip(segments, offsets):
+                for row, metadata in enumerate(segment.metadata):
+                    if not _matches_filter(metadata, extra_filter):
+                        scores[offset + row] = -np.inf
+
+        def locate(position) -> Tuple[Segment, int]:
+            number = int(np.searchsorted(offsets, position, side="right")) - 1
+            return segments[number], int(position - offsets[number])
+
+        candidates = top_k
+        if any(segment.quantized for segment in segments):
+            candidates = top_k * self.rescore
+        candidates = min(candidates, len(scores))
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[scores[top] > -np.inf]
+
+        if candidates > top_k:
+            # int8 scores only pick the candidates, the float16 rows rank them
+            for position in top:
+                segment, row = locate(position)
+                if segment.quantized:
+                    scores[position] = segment.values(row) @ query
+
+        top = top[np.argsort(-scores[top])][:top_k]
+
+        matches = []
+        for position in top:
+            segment, row = locate(position)
+            matches.append(
+                Match(
+                    id=segment.ids[row],
+                    score=float(scores[position]),
+                    metadata=segment.metadata[row] if include_metadata else {},
+                    values=segment.values(row).tolist() if include_values else [],
+                )
+            )
+
+        return QueryResponse(matches=matches)
+
+    def delete(self, ids=None, filter=None, delete_all=False, namespace=None):
+        """
+        Drops every pdf with `delete_all`, the vectors in `ids`, or else the
+        whole pdf in `filter`. Ids are looked up in the pdf of `filter` if
+        one is given and in every pdf otherwise.
+        """
+        if delete_all:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        elif ids:
+            self._delete_ids(set(ids), filter)
+        else:
+            shutil.rmtree(
+                self._partition(_pdf_id_from_filter(filter)), ignore_errors=True
+            )
+        self._load_segment.cache_clear()
+        return {}
+
+    def _delete_ids(self, ids: Set[str], filter: Optional[Dict[str, Any]]) -> None:
+        if filter:
+            directories = [self._partition(_pdf_id_from_filter(filter))]
+        else:
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                return
+            directories = [os.path.join(self.directory, name) for name in names]
+
+        for directory in directories:
+            for path in self._segment_paths(directory):
+                segment = self._load_segment(path)
+                keep = [row for row, id in enumerate(segment.ids) if id not in ids]
+                if len(keep) == len(segment.ids):
+                    continue
+
+                # the remaining rows become a new segment, named after its ids
+                if keep:
+                    self._write_segment(
+                        str(segment.metadata[keep[0]]["pdf_id"]),
+                        [
+                            {
+                                "id": segment.ids[row],
+                                "values": segment.values(row),
+                                "metadata": segment.metadata[row],
+                            }
+                            for row in keep
+                        ],
+                    )
+                # the .npy file goes first, so the segment is never half read
+                for suffix in (".npy", ".json", ".scale.npy", ".full.npy"):
+                    try:
+                        os.remove(f"{path}{suffix}")
+                    except FileNotFoundError:
+                        pass
+
+    def as_retriever(self, search_kwargs: Dict[str, Any]) -> PineconeRetriever:
+        return PineconeRetriever(
+            index=self, embeddings=self.embeddings, search_kwargs=search_kwargs
+        )
+
+
+@lru_cache()
+def get_local_store() -> LocalVectorStore:
+    return LocalVectorStore(
+        settings.local_vector_store_dir,
+        embeddings,
+        dtype=settings.local_vector_store_dtype,
+        rescore=settings.local_vector_store_rescore,
+    )
+
+
+def build_local_retriever(chat_args: ChatArgs, k: int) -> PineconeRetriever:
+    search_kwargs = {"filter": {"pdf_id": chat_args.pdf_id}, "k": k}
+
+    return get_local_store().as_retriever(search_kwargs=search_kwargs)
+
+
+# Opt-in with local_vector_store_dir, from then on ingestion writes to the
+# local store as well. Pdfs ingested before that have no local vectors.
+local_retriever_registry = (
+    {
+        "local_2": partial(build_local_retriever, k=2),
+        "local_4": partial(build_local_retriever, k=4),
+        "local_6": partial(build_local_retriever, k=6),
+    }
+    if settings.local_vector_store_dir
+    else {}
+)
@@ -1,26 +1,187 @@
-from functools import partial
+import asyncio
+import json
+from functools import lru_cache, partial
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import redis
 from app.chat.embeddings.openai import embeddings
+from app.chat.embeddings.shared import aembed_query
+from app.chat.lru import LRUCache
 from app.chat.models import ChatArgs
-from langchain_pinecone import PineconeVectorStore
+from app.chat.vector_stores.chunk_store import Match, hydrate_matches
+from app.chat.vector_stores.rerank import maximal_marginal_relevance
+from app.chat.vector_stores.retrieval_cache import current_generation
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
 from pinecone import Pinecone
 
 from app.settings import get_settings
 
 settings = get_settings()
 
-pc = Pinecone(api_key=settings.pinecone_api_key, environment=settings.pinecone_env_name)
 
-index = pc.Index(settings.pinecone_index_name)
+@lru_cache()
+def get_index():
+    """Connects to the pinecone index on first use rather than on import"""
+    pc = Pinecone(api_key=settings.pinecone_api_key, environment=settings.pinecone_env_name)
+    return pc.Index(settings.pinecone_index_name)
+
+
+class PineconeRetriever(BaseRetriever):
+    """
+    Similarity search against the pinecone index. Vectors only carry ids,
+    `pdf_id` and `page`; the chunk text is hydrated from the chunk store
+    after the search.
+    """
+
+    index: Any
+    embeddings: Embeddings
+    search_kwargs: Dict[str, Any]
+    include_values: bool = False
+
+    def _query(self, vector: List[float]):
+        return self.index.query(
+            vector=vector,
+            top_k=self.search_kwargs.get("k", 4),
+            filter=self.search_kwargs.get("filter"),
+            include_metadata=True,
+            include_values=self.include_values,
+        )
+
+    def search_by_vector(self, vector: List[float]) -> List[Document]:
+        return hydrate_matches(self._query(vector).matches)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.search_by_vector(self.embeddings.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        vector = await aembed_query(self.embeddings, query)
+        # the index clients are synchronous, keep them off the event loop
+        return await asyncio.to_thread(self.search_by_vector, vector)
+
+
+# MMR rankings, shared by the retrievers of every k for the same query
+_rankings: LRUCache = LRUCache(max_size=1024, ttl=settings.mmr_ranking_ttl)
+
+
+class MMRRetriever(PineconeRetriever):
+    """
+    Over-fetches `fetch_k` candidates, with their vectors, in a single query
+    and reranks them with maximal marginal relevance, so overlapping near
+    duplicate chunks do not crowd the prompt.
+
+    The ranking is computed `rank_depth` deep and cached, and since MMR is
+    greedy the top k of it is the MMR result for k. Retrievers for any k up
+    to `rank_depth` therefore share one fetch and just slice the ranking.
+    Only the selected chunks are hydrated. Rankings are keyed by the pdf's
+    generation, so re-ingesting the pdf invalidates them.
+    """
 
-vectorstore = PineconeVectorStore(index=index, embedding=embeddings)
+    pdf_id: str
+    k: int
+    rank_depth: int
+    lambda_mult: float
+    include_values: bool = True
 
-def build_retriever(chat_args: ChatArgs, k: int) -> PineconeVectorStore.as_retriever:
+    def _ranking_key(self, query: str) -> Optional[str]:
+        """None if redis is unavailable, the ranking is then not cached"""
+        try:
+            generation = current_generation(self.pdf_id)
+        except redis.RedisError:
+            return None
+
+        return json.dumps(
+            [
+                self.pdf_id,
+                generation,
+                self.search_kwargs,
+                self.rank_depth,
+                self.lambda_mult,
+                " ".join(query.split()),
+            ],
+            sort_keys=True,
+        )
+
+    def _rank(self, vector: List[float]) -> List[Match]:
+        matches = self._query(vector).matches
+        if not matches:
+            return []
+
+        order = maximal_marginal_relevance(
+            np.asarray(vector),
+            np.asarray([match.values for match in matches]),
+            k=self.rank_depth,
+            lambda_mult=self.lambda_mult,
+        )
+        # the vectors are only needed for the rerank, don't cache them
+        return [
+            Match(id=matches[i].id, score=matches[i].score, metadata=matches[i].metadata)
+            for i in order
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = self._ranking_key(query)
+        ranking = _rankings.get(key) if key else None
+        if ranking is None:
+            ranking = self._rank(self.embeddings.embed_query(query))
+            if key:
+                _rankings.set(key, ranking)
+
+        return hydrate_matches(ranking[: self.k])
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key = await asyncio.to_thread(self._ranking_key, query)
+        ranking = _rankings.get(key) if key else None
+        if ranking is None:
+            vector = await aembed_query(self.embeddings, query)
+            ranking = await asyncio.to_thread(self._rank, vector)
+            if key:
+                _rankings.set(key, ranking)
+
+        return await asyncio.to_thread(hydrate_matches, ranking[: self.k])
+
+
+def build_retriever(chat_args: ChatArgs, k: int) -> PineconeRetriever:
     search_kwargs = {"filter": { "pdf_id": chat_args.pdf_id }, "k": k}
 
-    return vectorstore.as_retriever(search_kwargs=search_kwargs)
+    return PineconeRetriever(
+        index=get_index(), embeddings=embeddings, search_kwargs=search_kwargs
+    )
+
+
+def build_mmr_retriever(chat_args: ChatArgs, k: int) -> MMRRetriever:
+    search_kwargs = {
+        "filter": {"pdf_id": chat_args.pdf_id},
+        "k": max(k, settings.mmr_fetch_k),
+    }
+
+    return MMRRetriever(
+        index=get_index(),
+        embeddings=embeddings,
+        search_kwargs=search_kwargs,
+        pdf_id=chat_args.pdf_id,
+        k=k,
+        rank_depth=max(k, settings.mmr_rank_depth),
+        lambda_mult=settings.mmr_lambda,
+    )
+
 
-retriever_registry = {
-    "pinecone_2": partial(build_retriever, k=2),
-    "pinecone_4": partial(build_retriever, k=4),
-    "pinecone_6": partial(build_retriever, k=6),
-}
\ No newline at end of file
+pinecone_retriever_registry = {
+    "pinecone_2": partial(build_mmr_retriever, k=2),
+    "pinecone_4": partial(build_mmr_retriever, k=4),
+    "pinecone_6": partial(build_mmr_retriever, k=6),
+}
@@ -0,0 +1,50 @@
+from typing import List
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.7
+) -> List[int]:
+    """
+    Greedily selects up to k candidate rows that are similar to the query but
+    not to each other, returning their indices in selection order.
+
+    The candidate x candidate similarities come from a single matmul, and
+    each selection step is one vectorized update of every candidate's
+    highest similarity to the picks so far. The greedy order does not depend
+    on k, so the result for a smaller k is a prefix of the result for a
+    larger one.
+
+    :param query: The query vector, shape (d,).
+    :param candidates: The candidate vectors, shape (n, d).
+    :param lambda_mult: 1 ranks by relevance only, 0 by diversity only.
+    """
+    if not len(candidates) or k <= 0:
+        return []
+
+    candidates = np.asarray(candidates, dtype=np.float32)
+    candidates = candidates / (
+        np.linalg.norm(candidates, axis=1, keepdims=True) + 1e-12
+    )
+    query = np.asarray(query, dtype=np.float32)
+    query = query / (np.linalg.norm(query) + 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+
+    selected = []
+    for _ in range(min(k, len(candidates))):
+        # nothing selected yet: redundancy is -inf, rank by relevance alone
+        penalty = np.where(np.isinf(redundancy), 0.0, redundancy)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[pick])
+
+    return selected
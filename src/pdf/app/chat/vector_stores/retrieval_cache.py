@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import redis
+from app.chat.models import ChatArgs
+from app.chat.redis import client
+from app.settings import get_settings
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+PREFIX = "retrieval_cache"
+STATS_KEY = f"{PREFIX}:stats"
+
+# Metadata flag of documents from a fallback, such as BM25 only results of
+# a hybrid search past its deadline, which are never cached
+DEGRADED = "degraded"
+
+
+def _generation_key(pdf_id: str) -> str:
+    return f"{PREFIX}:generation:{pdf_id}"
+
+
+def current_generation(pdf_id: str) -> str:
+    """Raises redis.RedisError if redis is unavailable."""
+    return client.get(_generation_key(pdf_id)) or "0"
+
+
+def bump_generation(pdf_id: str) -> None:
+    """
+    Invalidates every cached retrieval (and answer, see app.chat.answer_cache)
+    for the pdf. Entries are keyed by the pdf's generation, so old ones are
+    simply never read again and expire with their TTL, no scan needed.
+    """
+    try:
+        client.incr(_generation_key(pdf_id))
+    except redis.RedisError:
+        logger.warning("Could not invalidate the retrieval cache of %s", pdf_id)
+
+
+def retrieval_cache_stats() -> Dict[str, float]:
+    try:
+        stats = client.hgetall(STATS_KEY)
+    except redis.RedisError:
+        logger.warning("Retrieval cache stats unavailable", exc_info=True)
+        stats = {}
+    hits = int(stats.get("hits", 0))
+    misses = int(stats.get("misses", 0))
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Serves repeated questions about a pdf from redis instead of embedding
+    the query and searching the index again.
+
+    Results are keyed by (pdf_id, generation, retriever name, query), the
+    name covers both the backend and `k`. Redis errors fall through to the
+    wrapped retriever, and `DEGRADED` results are not stored.
+    """
+
+    retriever: BaseRetriever
+    name: str
+    pdf_id: str
+    ttl: int
+
+    def _key(self, generation: str, query: str) -> str:
+        digest = hashlib.sha256(" ".join(query.split()).encode()).hexdigest()
+        return f"{PREFIX}:{self.pdf_id}:{generation}:{self.name}:{digest}"
+
+    def _lookup(self, query: str) -> Tuple[Optional[str], Optional[List[Document]]]:
+        try:
+            generation = current_generation(self.pdf_id)
+            key = self._key(generation, query)
+            cached = client.get(key)
+        except redis.RedisError:
+            logger.warning("Retrieval cache unavailable", exc_info=True)
+            return None, None
+
+        if cached is None:
+            return key, None
+
+        _count("hits")
+        return key, [Document(**doc) for doc in json.loads(cached)]
+
+    def _store(self, key: Optional[str], docs: List[Document]) -> None:
+        if key is None:
+            return
+
+        _count("misses")
+        if any(doc.metadata.get(DEGRADED) for doc in docs):
+            return
+
+        try:
+            client.set(key, json.dumps([_serialize(doc) for doc in docs]), ex=self.ttl)
+        except redis.RedisError:
+            logger.warning("Could not cache retrieval for %s", self.pdf_id)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        key, docs = self._lookup(query)
+        if docs is None:
+            docs = self.retriever.invoke(query)
+            self._store(key, docs)
+        return docs
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # redis calls block, keep them off the shared event loop
+        key, docs = await asyncio.to_thread(self._lookup, query)
+        if docs is None:
+            docs = await self.retriever.ainvoke(query)
+            await asyncio.to_thread(self._store, key, docs)
+        return docs
+
+
+def _count(field: str) -> None:
+    try:
+        client.hincrby(STATS_KEY, field, 1)
+    except redis.RedisError:
+        pass
+
+
+def _serialize(doc: Document) -> Dict[str, Any]:
+    return {"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def with_retrieval_cache(
+    name: str, build: Callable[[ChatArgs], BaseRetriever]
+) -> Callable[[ChatArgs], BaseRetriever]:
+    """Wraps a retriever builder from the registry, see retrieval_cache_ttl"""
+    if settings.retrieval_cache_ttl <= 0:
+        return build
+
+    def build_cached(chat_args: ChatArgs) -> CachedRetriever:
+        return CachedRetriever(
+            retriever=build(chat_args),
+            name=name,
+            pdf_id=chat_args.pdf_id,
+            ttl=settings.retrieval_cache_ttl,
+        )
+
+    return build_cached
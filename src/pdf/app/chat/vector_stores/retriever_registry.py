@@ -0,0 +1,15 @@
+from app.chat.vector_stores.hybrid import hybrid_retriever_registry
+from app.chat.vector_stores.local import local_retriever_registry
+from app.chat.vector_stores.pinecone import pinecone_retriever_registry
+from app.chat.vector_stores.retrieval_cache import with_retrieval_cache
+
+# Unified retriever registry combining all vector store backends, each
+# served through the retrieval cache
+retriever_registry = {
+    name: with_retrieval_cache(name, build)
+    for name, build in {
+        **pinecone_retriever_registry,
+        **local_retriever_registry,
+        **hybrid_retriever_registry,
+    }.items()
+}
@@ -1,4 +1,6 @@
+import os
 from functools import lru_cache
+from typing import Dict
 
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
@@ -17,6 +19,46 @@ class Settings(BaseSettings):
     pinecone_index_name: str = ""
     langfuse_public_key: str = ""
     langfuse_secret_key: str = ""
+    chunk_size_tokens: int = 128
+    chunk_overlap_tokens: int = 24
+    ingestion_workers: int = os.cpu_count() or 1
+    ingestion_min_pages_per_worker: int = 25
+    ingestion_pages_per_shard: int = 16
+    ingestion_pages_per_task: int = 50
+    ingestion_concurrency: int = 4
+    ingestion_max_retries: int = 3
+    embed_batch_size: int = 64
+    upsert_batch_size: int = 100
+    embedding_cache_backend: str = "sqlite"
+    embedding_cache_path: str = "embedding_cache.sqlite"
+    embedding_cache_max_bytes: int = 256 * 1024 * 1024
+    local_vector_store_dir: str = ""
+    local_vector_store_dtype: str = "float32"
+    local_vector_store_rescore: int = 4
+    retrieval_cache_ttl: int = 60 * 60
+    bm25_index_dir: str = "bm25_index"
+    bm25_cache_size: int = 64
+    hybrid_vector_deadline: float = 0.5
+    mmr_fetch_k: int = 20
+    mmr_rank_depth: int = 6
+    mmr_lambda: float = 0.7
+    mmr_ranking_ttl: int = 5 * 60
+    context_token_budget: int = 6000
+    context_token_budgets: Dict[str, int] = {
+        "gpt-3.5-turbo": 3000,
+        "gpt-4o": 12000,
+    }
+    llm_pool_size: int = 32
+    retriever_pool_size: int = 256
+    history_cache_backend: str = "local"
+    history_cache_size: int = 1024
+    history_cache_ttl: int = 60 * 60
+    window_memory_backend: str = "local"
+    window_memory_max_conversations: int = 10000
+    window_memory_ttl: int = 24 * 60 * 60
+    answer_cache_ttl: int = 24 * 60 * 60
+    answer_cache_threshold: float = 0.95
+    answer_cache_max_entries: int = 1000
 
     model_config = ConfigDict(env_file=".env", case_sensitive=False, extra="ignore")
 
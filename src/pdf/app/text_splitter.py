@@ -0,0 +1,110 @@
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+from langchain_text_splitters import TextSplitter
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "cl100k_base") -> tiktoken.Encoding:
+    """Shared encoder instance, loading one is far more expensive than using it"""
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def get_encoding_for_model(model_name: str) -> tiktoken.Encoding:
+    try:
+        return get_encoding(tiktoken.encoding_name_for_model(model_name))
+    except KeyError:
+        return get_encoding()
+
+
+class TiktokenTextSplitter(TextSplitter):
+    """
+    Splits text into chunks of at most `chunk_size` tokens, so chunks line
+    up with the token limits of the embedding model.
+
+    The text is encoded once and chunks are cut as windows over the token
+    ids, with the overlap taken by slicing rather than by re-splitting.
+    With a `separator` the text is first cut into pieces (e.g. lines),
+    which are packed whole into chunks where they fit.
+
+    Example Usage:
+
+    splitter = TiktokenTextSplitter(chunk_size=128, chunk_overlap=24)
+    docs = splitter.split_documents(pages)
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 128,
+        chunk_overlap: int = 24,
+        encoding_name: str = "cl100k_base",
+        separator: Optional[str] = None,
+        **kwargs,
+    ):
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._encoding = get_encoding(encoding_name)
+        self._separator = separator
+
+    def split_text(self, text: str) -> List[str]:
+        if self._separator is None:
+            chunks = self._split_tokens(self._encoding.encode_ordinary(text))
+        else:
+            chunks = self._pack_pieces(text.split(self._separator))
+
+        if self._strip_whitespace:
+            chunks = [chunk.strip() for chunk in chunks]
+        return [chunk for chunk in chunks if chunk]
+
+    def _decode(self, tokens: List[int]) -> str:
+        # A window can start or end inside a multi-byte character, drop
+        # those partial bytes rather than emitting replacement characters
+        return self._encoding.decode_bytes(tokens).decode("utf-8", errors="ignore")
+
+    def _split_tokens(self, tokens: List[int]) -> List[str]:
+        step = self._chunk_size - self._chunk_overlap
+        chunks = []
+        for start in range(0, len(tokens), step):
+            chunks.append(self._decode(tokens[start : start + self._chunk_size]))
+            if start + self._chunk_size >= len(tokens):
+                break
+        return chunks
+
+    def _pack_pieces(self, pieces: List[str]) -> List[str]:
+        counts = [
+            len(tokens) for tokens in self._encoding.encode_ordinary_batch(pieces)
+        ]
+        separator_count = len(self._encoding.encode_ordinary(self._separator))
+
+        chunks = []
+        current: List[str] = []
+        current_counts: List[int] = []
+        total = 0
+        for piece, count in zip(pieces, counts):
+            if count > self._chunk_size:
+                if current:
+                    chunks.append(self._separator.join(current))
+                    current, current_counts, total = [], [], 0
+                chunks.extend(self._split_tokens(self._encoding.encode_ordinary(piece)))
+                continue
+
+            if current and total + separator_count + count > self._chunk_size:
+                chunks.append(self._separator.join(current))
+                # carry trailing pieces over while they fit in the overlap
+                while current and (
+                    total > self._chunk_overlap
+                    or total + separator_count + count > self._chunk_size
+                ):
+                    total -= current_counts.pop(0) + (
+                        separator_count if current_counts else 0
+                    )
+                    current.pop(0)
+
+            total += count + (separator_count if current else 0)
+            current.append(piece)
+            current_counts.append(count)
+
+        if current:
+            chunks.append(self._separator.join(current))
+        return chunks
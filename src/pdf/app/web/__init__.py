@@ -1,7 +1,7 @@
 from flask import Flask
 from flask_cors import CORS
 
-from app.web.db import db, init_db_command
+from app.web.db import db, init_db_command, migrate_db_command
 from app.web.db import models
 from app.celery import celery_init_app
 from app.web.config import Config
@@ -32,6 +32,7 @@ def create_app():
 def register_extensions(app):
     db.init_app(app)
     app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
 
 
 def register_blueprints(app):
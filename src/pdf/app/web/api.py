@@ -1,9 +1,16 @@
-from typing import Dict
+import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from app.web.db import db
-from app.web.db.models import Message
+from app.web.db.models import Chunk, Message
 from app.web.db.models.conversation import Conversation
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.documents import Document
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+)
 
 
 def get_messages_by_conversation_id(
@@ -19,11 +26,49 @@ def get_messages_by_conversation_id(
     messages = (
         db.session.query(Message)
         .filter_by(conversation_id=conversation_id)
-        .order_by(Message.created_on.asc())
+        .order_by(Message.created_on.asc(), Message.id.asc())
     )
     return [message.as_lc_message() for message in messages]
 
 
+def iter_recent_messages_by_conversation_id(
+    conversation_id: str, limit: Optional[int] = None
+) -> Iterator[BaseMessage]:
+    """
+    Streams the messages of the given conversation_id newest first, at
+    most `limit` of them. Served by the (conversation_id, created_on)
+    index, so only the rows consumed are read however long the
+    conversation is.
+
+    :param conversation_id: The id of the conversation
+    :param limit: The maximum number of messages
+
+    :return: An iterator over messages, newest first
+    """
+    query = (
+        db.select(Message)
+        .filter_by(conversation_id=conversation_id)
+        .order_by(Message.created_on.desc(), Message.id.desc())
+        .limit(limit)
+        .execution_options(yield_per=32)
+    )
+    for message in db.session.execute(query).scalars():
+        yield message.as_lc_message()
+
+
+def count_messages_by_conversation_id(conversation_id: str) -> int:
+    """
+    Counts the messages that belong to the given conversation_id
+
+    :param conversation_id: The id of the conversation
+
+    :return: The number of messages
+    """
+    return db.session.scalar(
+        db.select(db.func.count(Message.id)).filter_by(conversation_id=conversation_id)
+    )
+
+
 def add_message_to_conversation(
     conversation_id: str, role: str, content: str
 ) -> Message:
@@ -44,6 +89,29 @@ def add_message_to_conversation(
     )
 
 
+def add_messages_to_conversation(
+    conversation_id: str, messages: List[BaseMessage]
+) -> None:
+    """
+    Stores several messages of the given conversation in one commit. Each
+    gets its own timestamp, a microsecond apart, so they are read back in
+    the order given rather than tied on the time of the commit.
+
+    :param conversation_id: The id of the conversation
+    :param messages: LangChain messages, their type is stored as the role
+    """
+    created_on = datetime.datetime.utcnow()
+    for offset, message in enumerate(messages):
+        Message.create(
+            commit=False,
+            conversation_id=conversation_id,
+            role=message.type,
+            content=message.content,
+            created_on=created_on + datetime.timedelta(microseconds=offset),
+        )
+    db.session.commit()
+
+
 def get_conversation_components(conversation_id: str) -> Dict[str, str]:
     """
     Returns the components used in a conversation
@@ -64,3 +132,68 @@ def set_conversation_components(
     """
     conversation = Conversation.find_by(id=conversation_id)
     conversation.update(llm=llm, retriever=retriever, memory=memory)
+
+
+def add_chunks(docs: List[Document]) -> None:
+    """
+    Stores the text of the given chunks, keyed by their vector ids. Chunks
+    stored before under the same ids are replaced.
+
+    :param docs: Chunks with an id and `pdf_id` and `page` metadata
+    """
+    if not docs:
+        return
+
+    db.session.execute(db.delete(Chunk).where(Chunk.id.in_([doc.id for doc in docs])))
+    db.session.execute(
+        db.insert(Chunk),
+        [
+            {
+                "id": doc.id,
+                "pdf_id": doc.metadata["pdf_id"],
+                "page": doc.metadata.get("page"),
+                "content": doc.page_content,
+            }
+            for doc in docs
+        ],
+    )
+    db.session.commit()
+
+
+def get_chunk_contents_by_ids(ids: List[str]) -> Dict[str, str]:
+    """
+    Looks up the text of many chunks in one query
+
+    :param ids: The vector ids of the chunks
+
+    :return: A dict of vector id to chunk text, missing ids are left out
+    """
+    if not ids:
+        return {}
+
+    # A connection of its own rather than the request's session, so the
+    # lookup is safe to run on another thread while the session is in use
+    with db.engine.connect() as connection:
+        rows = connection.execute(
+            db.select(Chunk.id, Chunk.content).where(Chunk.id.in_(ids))
+        )
+        return {id: content for id, content in rows}
+
+
+def iter_chunks_by_pdf_id(pdf_id: str) -> Iterator[Tuple[str, Optional[int], str]]:
+    """
+    Streams the (id, page, content) of every chunk of the given pdf, in
+    batches rather than loading them all at once
+
+    :param pdf_id: The id of the pdf the chunks were indexed for
+    """
+    # A connection of its own, like get_chunk_contents_by_ids, since the
+    # index is built on a worker thread while the session is in use
+    with db.engine.connect() as connection:
+        rows = connection.execute(
+            db.select(Chunk.id, Chunk.page, Chunk.content)
+            .where(Chunk.pdf_id == pdf_id)
+            .execution_options(yield_per=1000)
+        )
+        for id, page, content in rows:
+            yield id, page, content
@@ -1,17 +1,36 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Runs tasks inline with an in-memory broker, e.g. for tests
+CELERY_ALWAYS_EAGER = os.environ.get("CELERY_ALWAYS_EAGER", "").lower() == "true"
+
 
 class Config:
     SESSION_PERMANENT = True
     SECRET_KEY = os.environ["SECRET_KEY"]
     SQLALCHEMY_DATABASE_URI = os.environ["SQLALCHEMY_DATABASE_URI"]
     UPLOAD_URL = os.environ.get("UPLOAD_URL", "https://prod-upload-langchain.fly.dev")
+    # Shared by the web process and the workers, see app.web.files.BlobCache
+    BLOB_CACHE_DIR = os.environ.get(
+        "BLOB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "pdf-blob-cache")
+    )
+    BLOB_CACHE_MAX_BYTES = int(os.environ.get("BLOB_CACHE_MAX_BYTES", 1024**3))
     CELERY = {
-        "broker_url": os.environ.get("RABBITMQ_URI", False),
+        "broker_url": os.environ.get(
+            "RABBITMQ_URI", "memory://" if CELERY_ALWAYS_EAGER else False
+        ),
+        # chords need a result backend to know when all page ranges are done
+        "result_backend": os.environ.get("REDIS_URI"),
         "task_ignore_result": True,
+        "task_always_eager": CELERY_ALWAYS_EAGER,
+        "task_eager_propagates": CELERY_ALWAYS_EAGER,
+        # size aware scheduling, see app.web.tasks.embeddings.ingestion_priority
+        "task_queue_max_priority": 10,
+        "task_default_priority": 5,
+        "worker_prefetch_multiplier": 1,
         "broker_connection_retry_on_startup": False,
     }
@@ -5,6 +5,14 @@ from flask import current_app
 
 db = SQLAlchemy()
 
+# Columns added to existing tables since they were created, as
+# (table, column, DDL type)
+ADDED_COLUMNS = [
+    ("pdf", "content_hash", "VARCHAR(64)"),
+    ("pdf", "alias_of", "VARCHAR"),
+    ("pdf", "indexed", "BOOLEAN NOT NULL DEFAULT false"),
+]
+
 
 @click.command("init-db")
 def init_db_command():
@@ -16,3 +24,45 @@ def init_db_command():
         db.drop_all()
         db.create_all()
     click.echo("Initialized the database.")
+
+
+@click.command("migrate-db")
+def migrate_db_command():
+    """Adds missing tables and indexes, keeping the existing data."""
+    with current_app.app_context():
+        db.create_all()
+        add_missing_columns()
+        if db.engine.dialect.name == "sqlite":
+            # SQLite stores server default timestamps as 'YYYY-MM-DD HH:MM:SS'
+            # but values written from Python with microseconds, and compares
+            # them as text. Pad the former so pagination cursors match rows.
+            for table in ("conversation", "message"):
+                db.session.execute(
+                    db.text(
+                        f"UPDATE {table} SET created_on = created_on || '.000000' "
+                        "WHERE length(created_on) = 19"
+                    )
+                )
+            db.session.commit()
+        # create_all skips tables that exist, so indexes added to their
+        # models later are created here (CREATE INDEX IF NOT EXISTS)
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(db.engine, checkfirst=True)
+    click.echo("Migrated the database.")
+
+
+def add_missing_columns():
+    """create_all skips tables that exist, this adds the columns they lack."""
+    inspector = db.inspect(db.engine)
+    for table, column, ddl_type in ADDED_COLUMNS:
+        columns = {c["name"] for c in inspector.get_columns(table)}
+        if column in columns:
+            continue
+        db.session.execute(
+            db.text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+        )
+        if (table, column) == ("pdf", "indexed"):
+            # pdfs from before the flag went through the old ingestion
+            db.session.execute(db.text("UPDATE pdf SET indexed = true"))
+    db.session.commit()
@@ -2,4 +2,5 @@ from .user import User
 from .pdf import Pdf
 from .conversation import Conversation
 from .message import Message
+from .chunk import Chunk
 from .base import BaseModel as Model
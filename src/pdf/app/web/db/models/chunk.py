@@ -0,0 +1,22 @@
+from app.web.db import db
+from .base import BaseModel
+
+
+class Chunk(BaseModel):
+    """
+    Text of an indexed pdf chunk, keyed by the id of its vector so that the
+    vector index only has to carry ids and small metadata.
+    """
+
+    id: str = db.Column(db.String(), primary_key=True)
+    pdf_id: str = db.Column(db.String(), index=True, nullable=False)
+    page: int = db.Column(db.Integer)
+    content: str = db.Column(db.Text, nullable=False)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "pdf_id": self.pdf_id,
+            "page": self.page,
+            "content": self.content,
+        }
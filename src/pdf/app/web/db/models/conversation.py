@@ -1,11 +1,17 @@
+import datetime
 import uuid
+from typing import Dict, List
 from app.web.db import db
 from .base import BaseModel
+from .message import Message
 
 
 class Conversation(BaseModel):
     id: str = db.Column(db.String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    created_on = db.Column(db.DateTime, server_default=db.func.now())
+    # stamped from Python so every row stores the same format, see keyset_page
+    created_on = db.Column(
+        db.DateTime, default=datetime.datetime.utcnow, server_default=db.func.now()
+    )
 
     retriever: str = db.Column(db.String)
     memory: str = db.Column(db.String)
@@ -18,12 +24,60 @@ class Conversation(BaseModel):
     user = db.relationship("User", back_populates="conversations")
 
     messages = db.relationship(
-        "Message", back_populates="conversation", order_by="Message.created_on"
+        "Message",
+        back_populates="conversation",
+        order_by="[Message.created_on, Message.id]",
     )
 
+    @classmethod
+    def summaries(cls, ids: List[str]) -> Dict[str, dict]:
+        """
+        Message count and last message of each conversation, in two queries
+        however many conversations there are.
+        """
+        summaries = {id: {"message_count": 0, "last_message": None} for id in ids}
+        if not ids:
+            return summaries
+
+        counts = db.session.execute(
+            db.select(Message.conversation_id, db.func.count(Message.id))
+            .where(Message.conversation_id.in_(ids))
+            .group_by(Message.conversation_id)
+        )
+        for id, count in counts:
+            summaries[id]["message_count"] = count
+
+        # the newest message per conversation, ties broken on the id like
+        # the message listings
+        position = (
+            db.func.row_number()
+            .over(
+                partition_by=Message.conversation_id,
+                order_by=(Message.created_on.desc(), Message.id.desc()),
+            )
+            .label("position")
+        )
+        ranked = (
+            db.select(Message.id, position)
+            .where(Message.conversation_id.in_(ids))
+            .subquery()
+        )
+        last_messages = db.session.execute(
+            db.select(Message).join(
+                ranked, db.and_(Message.id == ranked.c.id, ranked.c.position == 1)
+            )
+        ).scalars()
+        for message in last_messages:
+            summaries[message.conversation_id]["last_message"] = message.as_dict()
+
+        return summaries
+
     def as_dict(self):
         return {
             "id": self.id,
             "pdf_id": self.pdf_id,
             "messages": [m.as_dict() for m in self.messages],
         }
+
+    def as_summary_dict(self, summary: dict):
+        return {"id": self.id, "pdf_id": self.pdf_id, **summary}
@@ -1,3 +1,4 @@
+import datetime
 import uuid
 from app.web.db import db
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
@@ -5,10 +6,19 @@ from .base import BaseModel
 
 
 class Message(BaseModel):
+    # history loads filter on the conversation and order by creation time
+    __table_args__ = (
+        db.Index(
+            "ix_message_conversation_id_created_on", "conversation_id", "created_on"
+        ),
+    )
+
     id: str = db.Column(
         db.String(), primary_key=True, default=lambda: str(uuid.uuid4())
     )
-    created_on = db.Column(db.DateTime, server_default=db.func.now())
+    created_on = db.Column(
+        db.DateTime, default=datetime.datetime.utcnow, server_default=db.func.now()
+    )
     role: str = db.Column(db.String(), nullable=False)
     content: str = db.Column(db.String(), nullable=False)
 
@@ -1,4 +1,5 @@
 import uuid
+from typing import Optional
 from app.web.db import db
 from .base import BaseModel
 
@@ -8,6 +9,10 @@ class Pdf(BaseModel):
         db.String(), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     name: str = db.Column(db.String(80), nullable=False)
+    content_hash: str = db.Column(db.String(64), index=True)
+    # id of an earlier upload with identical bytes whose vectors this pdf reuses
+    alias_of: str = db.Column(db.String(), nullable=True)
+    indexed: bool = db.Column(db.Boolean, nullable=False, default=False)
     user_id: int = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     user = db.relationship("User", back_populates="pdfs")
 
@@ -17,9 +22,28 @@ class Pdf(BaseModel):
         order_by="desc(Conversation.created_on)",
     )
 
+    @property
+    def index_id(self) -> str:
+        """The pdf_id its file and chunk vectors are stored under."""
+        return self.alias_of or self.id
+
+    @classmethod
+    def find_source(cls, content_hash: str) -> Optional["Pdf"]:
+        """
+        Finds an indexed pdf with the same content, if any. Uploads whose
+        ingestion is still running or failed are not reused, the new upload
+        is ingested in full instead.
+        """
+        return db.session.execute(
+            db.select(cls)
+            .filter_by(content_hash=content_hash, alias_of=None, indexed=True)
+            .limit(1)
+        ).scalar_one_or_none()
+
     def as_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "user_id": self.user_id,
+            "indexed": self.indexed,
         }
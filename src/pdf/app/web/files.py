@@ -1,20 +1,108 @@
+import hashlib
 import json
 import os
+import shutil
 import tempfile
-from typing import Dict, Tuple
+import time
+from typing import Dict, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 from app.web.config import Config
 
 upload_url = f"{Config.UPLOAD_URL}/upload"
 
+# One pooled session per process, so uploads and downloads reuse
+# keep-alive connections to the upload service
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_maxsize=10))
+session.mount("https://", HTTPAdapter(pool_maxsize=10))
+
+
+class BlobCache:
+    """
+    Local directory of uploaded files, shared by the web process and the
+    workers on the same host, with least recently used eviction once the
+    files exceed `max_bytes`.
+
+    Files are written to a temporary name and renamed into place, so a
+    reader never sees a partial file. Files used within the last
+    `min_age` seconds are never evicted, as a task may still be reading
+    them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, min_age: float = 300):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, file_id: str) -> str:
+        return os.path.join(self.directory, file_id)
+
+    def get(self, file_id: str) -> Optional[str]:
+        path = self.path(file_id)
+        try:
+            # mtime doubles as the last access time for eviction
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, file_id: str, local_file_path: str) -> str:
+        with open(local_file_path, "rb") as f:
+            return self.write(file_id, f)
+
+    def write(self, file_id: str, stream) -> str:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(stream, f)
+            os.replace(temp_path, self.path(file_id))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        self.evict()
+        return self.path(file_id)
+
+    def evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.min_age
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes or mtime > cutoff:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+blob_cache = BlobCache(Config.BLOB_CACHE_DIR, Config.BLOB_CACHE_MAX_BYTES)
+
 
 def upload(local_file_path: str) -> Tuple[Dict[str, str], int]:
     with open(local_file_path, "rb") as f:
-        response = requests.post(upload_url, files={"file": f})
+        response = session.post(upload_url, files={"file": f})
         return json.loads(response.text), response.status_code
 
 
+def fingerprint(local_file_path: str) -> str:
+    """Returns the sha256 hex digest of the file's contents."""
+    digest = hashlib.sha256()
+    with open(local_file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def create_download_url(file_id):
     return f"{Config.UPLOAD_URL}/download/{file_id}"
 
@@ -24,26 +112,34 @@ def download(file_id):
 
 
 class _Download:
+    """
+    Provides a local path for the given file, reading it from the blob
+    cache when the upload happened on this host and only downloading it
+    (into the cache) otherwise.
+    """
+
     def __init__(self, file_id):
         self.file_id = file_id
-        self.temp_dir = tempfile.TemporaryDirectory()
         self.file_path = ""
 
     def download(self):
-        self.file_path = os.path.join(self.temp_dir.name, self.file_id)
-        response = requests.get(create_download_url(self.file_id), stream=True)
+        self.file_path = blob_cache.get(self.file_id)
+        if self.file_path:
+            return self.file_path
+
+        response = session.get(create_download_url(self.file_id), stream=True)
 
         # Check if the request was successful
         response.raise_for_status()
 
-        with open(self.file_path, "wb") as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
+        with response:
+            response.raw.decode_content = True
+            self.file_path = blob_cache.write(self.file_id, response.raw)
 
         return self.file_path
 
     def cleanup(self):
-        self.temp_dir.cleanup()
+        pass
 
     def __enter__(self):
         return self.download()
@@ -0,0 +1,70 @@
+import base64
+import datetime
+import json
+from typing import List, Optional, Tuple
+
+from app.web.db import db
+from flask import Request
+from werkzeug.exceptions import BadRequest
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(created_on: datetime.datetime, id: str) -> str:
+    position = json.dumps([created_on.isoformat(), id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, str]:
+    try:
+        created_on, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(created_on), id
+    except ValueError:
+        raise BadRequest("Invalid cursor")
+
+
+def page_args(request: Request) -> Tuple[int, Optional[str]]:
+    """Reads `limit` (capped at MAX_LIMIT) and `cursor` from the query string."""
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest("limit must be an integer")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+    return min(limit, MAX_LIMIT), request.args.get("cursor")
+
+
+def keyset_page(
+    query, model, limit: int, cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+    Returns a page of `query`'s rows, newest first, and the cursor of the
+    next page (None on the last page).
+
+    Pages are keyed on (created_on, id) rather than an offset, so every
+    page costs one index range scan however deep into the list it is, and
+    rows added meanwhile do not shift the pages being walked.
+
+    SQLite compares created_on as text, so the cursor only matches its own
+    row when every row is stored in the format the bound value takes. The
+    models stamp created_on from Python for that, and migrate-db pads the
+    rows the server default stamped to seconds.
+    """
+    query = query.order_by(model.created_on.desc(), model.id.desc())
+    if cursor:
+        created_on, id = decode_cursor(cursor)
+        query = query.where(
+            db.or_(
+                model.created_on < created_on,
+                db.and_(model.created_on == created_on, model.id < id),
+            )
+        )
+
+    # one extra row tells whether there is a next page
+    rows = db.session.execute(query.limit(limit + 1)).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_on, rows[-1].id)
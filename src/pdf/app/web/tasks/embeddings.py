@@ -1,12 +1,81 @@
-from celery import shared_task
+import math
+import os
+
+from celery import chord, shared_task
 
 from app.web.db.models import Pdf
 from app.web.files import download
 from app.chat import create_embeddings_for_pdf
+from app.chat.ingestion.extract import count_pages, page_ranges
+from app.chat.vector_stores.bm25 import build_bm25_index
+from app.settings import get_settings
+
+settings = get_settings()
+
+# Rough size of a pdf page, to estimate page counts from file sizes
+BYTES_PER_PAGE = 50 * 1024
+
+
+def ingestion_priority(num_pages: int) -> int:
+    """
+    Maps a page count to a celery task priority (9 is highest), dropping
+    one level every time the page count doubles past 20 pages, so small
+    pdfs are not stuck behind the page range tasks of large ones.
+
+    Example:
+
+        ingestion_priority(10) -> 9
+        ingestion_priority(600) -> 4
+    """
+    return max(0, 9 - int(math.log2(max(1, num_pages // 10))))
+
+
+def upload_priority(file_path: str) -> int:
+    """
+    Priority of a freshly uploaded pdf, from a page count estimated by its
+    file size so the upload request never has to parse the pdf.
+    `process_document` prioritizes the page range tasks by the real count.
+    """
+    return ingestion_priority(os.path.getsize(file_path) // BYTES_PER_PAGE)
 
 
 @shared_task()
 def process_document(pdf_id: int):
+    """
+    Fans ingestion of a pdf out into one task per page range, with
+    `finalize_document` as the chord callback once all of them finished.
+    """
     pdf = Pdf.find_by(id=pdf_id)
     with download(pdf.id) as pdf_path:
-        create_embeddings_for_pdf(pdf.id, pdf_path)
+        num_pages = count_pages(pdf_path)
+
+    priority = ingestion_priority(num_pages)
+    subtasks = [
+        embed_page_range.si(pdf.id, start, end).set(priority=priority)
+        for start, end in page_ranges(0, num_pages, settings.ingestion_pages_per_task)
+    ]
+    callback = finalize_document.si(pdf.id).set(priority=priority)
+
+    if subtasks:
+        chord(subtasks)(callback)
+    else:
+        callback.apply_async()
+
+
+@shared_task(ignore_result=False)
+def embed_page_range(pdf_id: str, start: int, end: int) -> int:
+    with download(pdf_id) as pdf_path:
+        report = create_embeddings_for_pdf(pdf_id, pdf_path, page_range=(start, end))
+    return report.vectors
+
+
+@shared_task()
+def finalize_document(pdf_id: str):
+    """
+    Builds the keyword index once all chunks are stored, then marks the pdf,
+    and any uploads aliasing it, as indexed.
+    """
+    build_bm25_index(pdf_id)
+
+    for pdf in [Pdf.find_by(id=pdf_id), *Pdf.where(alias_of=pdf_id)]:
+        pdf.update(indexed=True)
@@ -1,7 +1,10 @@
-from app.chat import ChatArgs, build_chat
-from app.web.db.models import Conversation, Pdf
+from app.chat import ChatArgs, aio, build_async_chat
+from app.web.db import db
+from app.web.db.models import Conversation, Message, Pdf
 from app.web.hooks import load_model, login_required
+from app.web.pagination import keyset_page, page_args
 from flask import Blueprint, Response, g, jsonify, request, stream_with_context
+from sqlalchemy.orm import selectinload
 
 bp = Blueprint("conversation", __name__, url_prefix="/api/conversations")
 
@@ -10,7 +13,42 @@ bp = Blueprint("conversation", __name__, url_prefix="/api/conversations")
 @login_required
 @load_model(Pdf, lambda r: r.args.get("pdf_id"))
 def list_conversations(pdf):
-    return [c.as_dict() for c in pdf.conversations]
+    """
+    Conversations of the pdf, newest first. Without `limit` or `cursor`
+    every conversation is returned as a plain list, as the client expects;
+    with them a page plus the `next_cursor` to fetch the following one.
+
+    `view=summary` replaces each conversation's messages with its
+    `message_count` and `last_message`.
+    """
+    summary = request.args.get("view") == "summary"
+    query = db.select(Conversation).filter_by(pdf_id=pdf.id)
+    if not summary:
+        # all messages in one more query instead of one per conversation
+        query = query.options(selectinload(Conversation.messages))
+
+    paginated = "limit" in request.args or "cursor" in request.args
+    if paginated:
+        limit, cursor = page_args(request)
+        conversations, next_cursor = keyset_page(query, Conversation, limit, cursor)
+    else:
+        conversations = (
+            db.session.execute(
+                query.order_by(Conversation.created_on.desc(), Conversation.id.desc())
+            )
+            .scalars()
+            .all()
+        )
+
+    if summary:
+        summaries = Conversation.summaries([c.id for c in conversations])
+        items = [c.as_summary_dict(summaries[c.id]) for c in conversations]
+    else:
+        items = [c.as_dict() for c in conversations]
+
+    if paginated:
+        return {"conversations": items, "next_cursor": next_cursor}
+    return items
 
 
 @bp.route("/", methods=["POST"])
@@ -22,6 +60,27 @@ def create_conversation(pdf):
     return conversation.as_dict()
 
 
+@bp.route("/<string:conversation_id>/messages", methods=["GET"])
+@login_required
+@load_model(Conversation)
+def list_messages(conversation):
+    """
+    A page of the conversation's messages, walking back from the newest.
+    Messages within a page are in chronological order.
+    """
+    limit, cursor = page_args(request)
+    messages, next_cursor = keyset_page(
+        db.select(Message).filter_by(conversation_id=conversation.id),
+        Message,
+        limit,
+        cursor,
+    )
+    return {
+        "messages": [m.as_dict() for m in reversed(messages)],
+        "next_cursor": next_cursor,
+    }
+
+
 @bp.route("/<string:conversation_id>/messages", methods=["POST"])
 @login_required
 @load_model(Conversation)
@@ -33,7 +92,7 @@ def create_message(conversation):
 
     chat_args = ChatArgs(
         conversation_id=conversation.id,
-        pdf_id=pdf.id,
+        pdf_id=pdf.index_id,
         streaming=streaming,
         metadata={
             "conversation_id": conversation.id,
@@ -42,20 +101,19 @@ def create_message(conversation):
         },
     )
 
-    chat = build_chat(chat_args)
-
-    if not chat:
-        return "Chat not yet implemented!"
-
-    # Configuration for message history
-    config = {"configurable": {"session_id": conversation.id}}
+    # Not done: serving this view from an async (ASGI) server. The chat runs
+    # on the process wide event loop (see app.chat.aio) and this request
+    # thread only waits for its result or relays the stream, but Flask still
+    # serves the view under WSGI: every open stream holds one worker thread,
+    # so concurrent chats are bounded by the server's thread count.
+    chat = build_async_chat(chat_args)
 
     if streaming:
         def generate():
-            for chunk in chat.stream({"input": input}, config=config):
+            for chunk in aio.iterate(chat.astream(input)):
                 yield chunk
 
         return Response(stream_with_context(generate()), mimetype="text/event-stream")
     else:
-        response = chat.invoke({"input": input}, config=config)
+        response = aio.run(chat.ainvoke(input))
         return jsonify({"role": "assistant", "content": response})
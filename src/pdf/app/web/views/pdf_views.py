@@ -2,7 +2,7 @@ from flask import Blueprint, g, jsonify
 from werkzeug.exceptions import Unauthorized
 from app.web.hooks import login_required, handle_file_upload, load_model
 from app.web.db.models import Pdf
-from app.web.tasks.embeddings import process_document
+from app.web.tasks.embeddings import process_document, upload_priority
 from app.web import files
 
 bp = Blueprint("pdf", __name__, url_prefix="/api/pdfs")
@@ -20,13 +20,33 @@ def list():
 @login_required
 @handle_file_upload
 def upload_file(file_id, file_path, file_name):
+    content_hash = files.fingerprint(file_path)
+
+    # Identical bytes were ingested before, reuse that file and its vectors
+    source = Pdf.find_source(content_hash)
+    if source:
+        pdf = Pdf.create(
+            id=file_id,
+            name=file_name,
+            user_id=g.user.id,
+            content_hash=content_hash,
+            alias_of=source.id,
+            indexed=source.indexed,
+        )
+        return pdf.as_dict()
+
     res, status_code = files.upload(file_path)
     if status_code >= 400:
         return res, status_code
 
-    pdf = Pdf.create(id=file_id, name=file_name, user_id=g.user.id)
+    pdf = Pdf.create(
+        id=file_id, name=file_name, user_id=g.user.id, content_hash=content_hash
+    )
+
+    # Lets the worker read the file locally instead of downloading it again
+    files.blob_cache.put(pdf.id, file_path)
 
-    process_document.delay(pdf.id)
+    process_document.apply_async((pdf.id,), priority=upload_priority(file_path))
 
     return pdf.as_dict()
 
@@ -38,6 +58,6 @@ def show(pdf):
     return jsonify(
         {
             "pdf": pdf.as_dict(),
-            "download_url": files.create_download_url(pdf.id),
+            "download_url": files.create_download_url(pdf.index_id),
         }
     )
@@ -3,7 +3,13 @@ from werkzeug.exceptions import BadRequest
 
 from app.web.hooks import login_required, load_model
 from app.web.db.models import Conversation
-from app.chat import score_conversation, get_scores
+from app.chat import (
+    score_conversation,
+    get_scores,
+    retrieval_cache_stats,
+    answer_cache_stats,
+    embedding_cache_stats,
+)
 
 bp = Blueprint("score", __name__, url_prefix="/api/scores")
 
@@ -33,3 +39,15 @@ def list_scores():
     scores = get_scores()
 
     return jsonify(scores)
+
+
+@bp.route("/cache", methods=["GET"])
+@login_required
+def cache_stats():
+    return jsonify(
+        {
+            "retrieval": retrieval_cache_stats(),
+            "answer": answer_cache_stats(),
+            "embedding": embedding_cache_stats(),
+        }
+    )
@@ -0,0 +1,20 @@
+"""
+Offline benchmarks for the pdf app.
+
+Run from src/pdf, e.g. `python -m benchmarks.streaming_rss`. Importing the
+app requires its usual environment, so placeholders are filled in for
+anything that is unset. Nothing here talks to OpenAI, Pinecone or Redis.
+"""
+
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+os.environ.setdefault("REDIS_URI", "redis://localhost:6379/0")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_CACHE_BACKEND", "none")
+os.environ.setdefault("LOCAL_VECTOR_STORE_DIR", "")
+
+# The app is always entered through app.web (see app.celery.worker), which
+# is the only import order that resolves app.chat <-> app.web cleanly.
+import app.web  # noqa: E402, F401
@@ -0,0 +1,126 @@
+"""
+Cost of `build_async_chat`, which the conversation views call once per
+message, with and without the component pool (see app.chat.pool), for
+each retriever and LLM combination. `build_component` is also timed on
+its own for the retriever and the LLM.
+
+The conversation lives in an in-memory sqlite database and pinecone is
+swapped for an in-memory index, so only the construction of the chat and
+its components is measured.
+
+    python -m benchmarks.build_chat --requests 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import time
+
+import benchmarks  # noqa: F401
+
+
+def timed(build, requests: int) -> dict:
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        # build_async_chat prints the components it picked
+        with contextlib.redirect_stdout(io.StringIO()):
+            build()
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    return {
+        "mean_ms": round(statistics.mean(timings) * 1000, 3),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95)] * 1000, 3),
+    }
+
+
+def measure(chat_args, llm: str, retriever: str, requests: int) -> dict:
+    from app.chat.chat import build_async_chat
+    from app.chat.llms.chatopenai import llm_registry
+    from app.chat.pool import build_component
+    from app.chat.vector_stores.retriever_registry import retriever_registry
+
+    return {
+        "chat": timed(lambda: build_async_chat(chat_args), requests),
+        "llm": timed(
+            lambda: build_component(llm_registry, "llm", llm, chat_args), requests
+        ),
+        "retriever": timed(
+            lambda: build_component(
+                retriever_registry, "retriever", retriever, chat_args
+            ),
+            requests,
+        ),
+    }
+
+
+def main():
+    from app.chat import pool
+    from app.chat.models import ChatArgs
+    from app.chat.vector_stores import pinecone
+    from app.web import create_app
+    from app.web.db import db
+    from app.web.db.models import Conversation, Pdf, User
+    from benchmarks.fakes import InMemoryIndex, swapped
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--llms", nargs="+", default=["gpt-3.5-turbo", "gpt-4o"])
+    parser.add_argument("--retrievers", nargs="+", default=["pinecone_4", "hybrid_4"])
+    args = parser.parse_args()
+
+    app = create_app()
+    index = InMemoryIndex()
+    with app.app_context(), swapped(pinecone, get_index=lambda: index):
+        db.create_all()
+        user = User.create(email="benchmark@example.com", password="benchmark")
+        pdf = Pdf.create(id="benchmark", name="benchmark.pdf", user_id=user.id)
+
+        for llm in args.llms:
+            for retriever in args.retrievers:
+                conversation = Conversation.create(
+                    user_id=user.id,
+                    pdf_id=pdf.id,
+                    llm=llm,
+                    retriever=retriever,
+                    memory="sql_memory",
+                )
+                chat_args = ChatArgs(
+                    conversation_id=conversation.id,
+                    pdf_id=pdf.id,
+                    streaming=True,
+                    metadata={
+                        "conversation_id": conversation.id,
+                        "user_id": user.id,
+                        "pdf_id": pdf.id,
+                    },
+                )
+
+                with swapped(pool, pools={}):
+                    unpooled = measure(chat_args, llm, retriever, args.requests)
+                for component_pool in pool.pools.values():
+                    component_pool.clear()
+                pooled = measure(chat_args, llm, retriever, args.requests)
+
+                print(
+                    json.dumps(
+                        {
+                            "llm": llm,
+                            "retriever": retriever,
+                            "unpooled": unpooled,
+                            "pooled": pooled,
+                            "speedup": round(
+                                unpooled["chat"]["mean_ms"] / pooled["chat"]["mean_ms"],
+                                2,
+                            ),
+                        }
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Queries and time per `GET /api/conversations` as the number of
+conversations grows, against the lazy per-conversation loading it
+replaced. Every listing mode should stay at a constant query count.
+
+    python -m benchmarks.conversation_listing --conversations 10 100 1000
+"""
+
+import argparse
+import datetime
+import json
+import time
+from urllib.parse import quote
+
+import benchmarks  # noqa: F401
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._executed)
+
+    def _executed(self, *args):
+        self.count += 1
+
+
+def populate(db, pdf_id: str, user_id: str, conversations: int, messages: int):
+    from app.web.db.models import Conversation, Message
+
+    started = datetime.datetime(2024, 1, 1)
+    db.session.execute(
+        db.insert(Conversation),
+        [
+            {
+                "id": f"{pdf_id}-c{i}",
+                "pdf_id": pdf_id,
+                "user_id": user_id,
+                "created_on": started + datetime.timedelta(minutes=i),
+            }
+            for i in range(conversations)
+        ],
+    )
+    db.session.execute(
+        db.insert(Message),
+        [
+            {
+                "id": f"{pdf_id}-c{i}-m{j}",
+                "conversation_id": f"{pdf_id}-c{i}",
+                "role": "human" if j % 2 == 0 else "ai",
+                "content": f"message {j} of conversation {i}",
+                "created_on": started + datetime.timedelta(minutes=i, seconds=j),
+            }
+            for i in range(conversations)
+            for j in range(messages)
+        ],
+    )
+    db.session.commit()
+
+
+def measure(counter, request) -> dict:
+    counter.count = 0
+    started = time.perf_counter()
+    request()
+    return {
+        "queries": counter.count,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def main():
+    from app.web import create_app
+    from app.web.db import db
+    from app.web.db.models import Pdf, User
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User.create(email="benchmark@example.com", password="benchmark")
+        user_id = user.id
+        for count in args.conversations:
+            Pdf.create(id=f"pdf{count}", name="benchmark.pdf", user_id=user_id)
+            populate(db, f"pdf{count}", user_id, count, args.messages)
+        counter = QueryCounter(db.engine)
+
+        def lazy(pdf_id):
+            # the listing as it was: messages loaded per conversation
+            db.session.expire_all()
+            pdf = Pdf.find_by(id=pdf_id)
+            return [c.as_dict() for c in pdf.conversations]
+
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+
+        def get(url):
+            response = client.get(url)
+            assert response.status_code == 200, response.text
+            return response.json
+
+        for count in args.conversations:
+            url = f"/api/conversations/?pdf_id=pdf{count}"
+            first_page = get(f"{url}&limit=20")
+            conversation_id = first_page["conversations"][0]["id"]
+            page_url = f"{url}&limit=20"
+            if first_page["next_cursor"]:
+                page_url += f"&cursor={quote(first_page['next_cursor'])}"
+            result = {
+                "conversations": count,
+                "lazy": measure(counter, lambda: lazy(f"pdf{count}")),
+                "all": measure(counter, lambda: get(url)),
+                "summary": measure(counter, lambda: get(f"{url}&view=summary")),
+                "page": measure(counter, lambda: get(page_url)),
+                "messages_page": measure(
+                    counter,
+                    lambda: get(
+                        f"/api/conversations/{conversation_id}/messages?limit=10"
+                    ),
+                ),
+            }
+            print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
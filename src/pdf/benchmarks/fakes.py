@@ -0,0 +1,188 @@
+import contextlib
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embeddings: the same text always maps to the same vector.
+
+    :param latency: Seconds to sleep per call, to stand in for the round
+        trip to the embeddings API.
+    """
+
+    def __init__(self, dimensions: int = 512, latency: float = 0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+        rng = np.random.default_rng(seed)
+        return rng.uniform(-1, 1, self.dimensions).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self._embed(text)
+
+
+class CountingIndex:
+    """Accepts upserts like a pinecone Index but only counts the vectors."""
+
+    def __init__(self):
+        self.vectors = 0
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace=None) -> Dict[str, int]:
+        self.vectors += len(vectors)
+        return {"upserted_count": len(vectors)}
+
+
+@dataclass
+class Match:
+    id: str
+    score: float
+    metadata: Dict[str, Any]
+    values: List[float] = field(default_factory=list)
+
+
+@dataclass
+class QueryResponse:
+    matches: List[Match]
+    namespace: str = ""
+
+
+def _matches_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]):
+    for key, condition in (filter or {}).items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class InMemoryIndex:
+    """
+    Stand-in for a pinecone `Index` covering the calls the app makes:
+    upsert, query (cosine, with metadata filters), fetch and delete.
+
+    :param latency: Seconds to sleep per call, to stand in for the round
+        trip to pinecone.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[Dict[str, Any]], namespace=None) -> Dict[str, int]:
+        time.sleep(self.latency)
+        with self._lock:
+            for vector in vectors:
+                self.records[vector["id"]] = {
+                    "values": np.asarray(vector["values"], dtype=np.float32),
+                    "metadata": dict(vector.get("metadata") or {}),
+                }
+        return {"upserted_count": len(vectors)}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = False,
+        include_metadata: bool = False,
+        namespace=None,
+    ) -> QueryResponse:
+        time.sleep(self.latency)
+        with self._lock:
+            candidates = [
+                (id, record)
+                for id, record in self.records.items()
+                if _matches_filter(record["metadata"], filter)
+            ]
+        if not candidates:
+            return QueryResponse(matches=[])
+
+        matrix = np.stack([record["values"] for _, record in candidates])
+        query = np.asarray(vector, dtype=np.float32)
+        scores = (
+            matrix
+            @ query
+            / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        )
+        top = np.argsort(-scores)[:top_k]
+
+        return QueryResponse(
+            matches=[
+                Match(
+                    id=candidates[i][0],
+                    score=float(scores[i]),
+                    metadata=candidates[i][1]["metadata"] if include_metadata else {},
+                    values=candidates[i][1]["values"].tolist()
+                    if include_values
+                    else [],
+                )
+                for i in top
+            ]
+        )
+
+    def fetch(self, ids: List[str], namespace=None) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "vectors": {
+                    id: {
+                        "id": id,
+                        "values": self.records[id]["values"].tolist(),
+                        "metadata": self.records[id]["metadata"],
+                    }
+                    for id in ids
+                    if id in self.records
+                }
+            }
+
+    def delete(self, ids=None, filter=None, delete_all=False, namespace=None):
+        with self._lock:
+            if delete_all:
+                self.records.clear()
+            for id in ids or []:
+                self.records.pop(id, None)
+            if filter:
+                for id in [
+                    id
+                    for id, record in self.records.items()
+                    if _matches_filter(record["metadata"], filter)
+                ]:
+                    del self.records[id]
+        return {}
+
+    def describe_index_stats(self) -> Dict[str, Any]:
+        return {"total_vector_count": len(self.records)}
+
+
+@contextlib.contextmanager
+def swapped(module, **attributes):
+    """Temporarily replaces module level attributes, e.g. the embeddings."""
+    originals = {name: getattr(module, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in originals.items():
+            setattr(module, name, value)
@@ -0,0 +1,167 @@
+"""
+History loads on a synthetic message table, before and after the
+(conversation_id, created_on) index, for the full `sql_memory` load and
+the windowed loads of `sql_window_memory` / `sql_token_window_memory`.
+
+    python -m benchmarks.history_window --messages 1000000
+"""
+
+import argparse
+import datetime
+import json
+import statistics
+import time
+
+import benchmarks  # noqa: F401
+
+INDEX_NAME = "ix_message_conversation_id_created_on"
+
+
+def populate(db, messages: int, per_conversation: int, long_conversation: int):
+    from app.web.db.models import Conversation, Message, Pdf, User
+
+    user = User.create(email="benchmark@example.com", password="benchmark")
+    pdf = Pdf.create(id="benchmark", name="benchmark.pdf", user_id=user.id)
+
+    conversations = max(1, (messages - long_conversation) // per_conversation)
+    db.session.execute(
+        db.insert(Conversation),
+        [
+            {"id": f"c{i}", "pdf_id": pdf.id, "user_id": user.id}
+            for i in range(conversations + 1)
+        ],
+    )
+
+    started = datetime.datetime(2024, 1, 1)
+    rows = []
+    for i in range(messages):
+        # the long conversation's messages are spread over the whole table
+        if i % (messages // long_conversation) == 0:
+            conversation_id = f"c{conversations}"
+        else:
+            conversation_id = f"c{i % conversations}"
+        rows.append(
+            {
+                "id": f"m{i}",
+                "conversation_id": conversation_id,
+                "role": "human" if i % 2 else "ai",
+                "content": f"message {i} " + "lorem ipsum dolor sit amet " * 4,
+                "created_on": started + datetime.timedelta(seconds=i),
+            }
+        )
+        if len(rows) == 50000:
+            db.session.execute(db.insert(Message), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Message), rows)
+    db.session.commit()
+
+    # message 1 never lands in the long conversation
+    return {"typical": f"c{1 % conversations}", "long": f"c{conversations}"}
+
+
+def timed(load, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        messages = load()
+        timings.append(time.perf_counter() - started)
+    return {
+        "messages": len(messages),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+    }
+
+
+def measure(conversations: dict, repeat: int) -> dict:
+    from app.chat.memories.sql_memory import WindowedSQLMessageHistory
+    from app.web.api import get_messages_by_conversation_id
+
+    results = {}
+    for name, conversation_id in conversations.items():
+        results[name] = {
+            "full": timed(
+                lambda: get_messages_by_conversation_id(conversation_id), repeat
+            ),
+            "last_10": timed(
+                lambda: WindowedSQLMessageHistory(conversation_id, k=10).messages,
+                repeat,
+            ),
+            "last_2000_tokens": timed(
+                lambda: (
+                    WindowedSQLMessageHistory(
+                        conversation_id, k=50, max_tokens=2000
+                    ).messages
+                ),
+                repeat,
+            ),
+        }
+    return results
+
+
+def query_plan(db, conversation_id: str) -> str:
+    from app.web.db.models import Message
+
+    query = (
+        db.select(Message)
+        .filter_by(conversation_id=conversation_id)
+        .order_by(Message.created_on.desc(), Message.id.desc())
+        .limit(10)
+    )
+    compiled = query.compile(db.engine, compile_kwargs={"literal_binds": True})
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}"))
+    return "; ".join(row[-1] for row in rows)
+
+
+def main():
+    from app.web import create_app
+    from app.web.db import db
+    from app.web.db.models import Message
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-conversation", type=int, default=100)
+    parser.add_argument("--long-conversation", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        # start from a table as it was before the index existed
+        db.session.execute(db.text(f"DROP INDEX {INDEX_NAME}"))
+
+        started = time.perf_counter()
+        conversations = populate(
+            db, args.messages, args.per_conversation, args.long_conversation
+        )
+        print(
+            f"Inserted {args.messages} messages in {time.perf_counter() - started:.1f}s"
+        )
+
+        before = measure(conversations, args.repeat)
+        plan_before = query_plan(db, conversations["long"])
+
+        # what `flask migrate-db` does
+        started = time.perf_counter()
+        for index in Message.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+        index_seconds = time.perf_counter() - started
+
+        after = measure(conversations, args.repeat)
+        print(
+            json.dumps(
+                {
+                    "messages": args.messages,
+                    "index_seconds": round(index_seconds, 2),
+                    "plan_before": plan_before,
+                    "plan_after": query_plan(db, conversations["long"]),
+                    "before": before,
+                    "after": after,
+                },
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
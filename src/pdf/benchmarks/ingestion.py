@@ -0,0 +1,215 @@
+"""
+Ingestion benchmark: chunks/sec, time to first vector, per-stage timings
+and peak RSS of `create_embeddings_for_pdf` on synthetic pdfs.
+
+OpenAI and Pinecone are swapped for deterministic fake embeddings and an
+in-memory index (optionally with simulated latency), and the chunk store
+runs on an in-memory sqlite database. Every size runs in a fresh process.
+Results are written as JSON, and can be compared against an earlier run:
+
+    python -m benchmarks.ingestion --pages 50 200 1000
+    python -m benchmarks.ingestion --baseline benchmarks/results/<earlier>.json
+"""
+
+import argparse
+import datetime
+import functools
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+import benchmarks  # noqa: F401
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+# Metrics where a lower value is better, used when comparing runs
+LOWER_IS_BETTER = ("seconds", "first_vector_seconds", "peak_rss_mb")
+
+
+class StageTimer:
+    """Accumulates the time spent inside wrapped functions and generators."""
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = defaultdict(float)
+
+    def function(self, stage: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - started
+
+        return timed
+
+    def generator(self, stage: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            iterator = fn(*args, **kwargs)
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self.seconds[stage] += time.perf_counter() - started
+                yield item
+
+        return timed
+
+
+def _run(pdf_path: str, pages: int, workers: int, latency: float) -> dict:
+    from app.chat import create_embeddings
+    from app.chat.ingestion import extract
+    from app.web import create_app
+    from app.web.db import db
+    from benchmarks.fakes import FakeEmbeddings, InMemoryIndex, swapped
+
+    timer = StageTimer()
+    index = InMemoryIndex(latency=latency)
+
+    build_text_splitter = extract.build_text_splitter
+
+    def timed_text_splitter():
+        text_splitter = build_text_splitter()
+        text_splitter.split_documents = timer.function(
+            "split", text_splitter.split_documents
+        )
+        return text_splitter
+
+    app = create_app()
+    with (
+        app.app_context(),
+        swapped(
+            extract,
+            iter_pages=timer.generator("load", extract.iter_pages),
+            build_text_splitter=timed_text_splitter,
+        ),
+        swapped(
+            create_embeddings,
+            embeddings=FakeEmbeddings(latency=latency),
+            get_index=lambda: index,
+            add_chunks=timer.function("store", create_embeddings.add_chunks),
+        ),
+        swapped(extract.settings, ingestion_workers=workers),
+    ):
+        db.create_all()
+
+        started = time.perf_counter()
+        report = create_embeddings.create_embeddings_for_pdf("benchmark", pdf_path)
+        seconds = time.perf_counter() - started
+
+    return {
+        "pages": pages,
+        "workers": workers,
+        "chunks": report.vectors,
+        "seconds": round(seconds, 4),
+        "chunks_per_second": round(report.vectors / seconds, 1),
+        "first_vector_seconds": round(report.first_vector_seconds or 0, 4),
+        # load and split are only measured in-process, i.e. with one worker
+        "stages": {
+            "load": round(timer.seconds["load"], 4),
+            "split": round(timer.seconds["split"], 4),
+            "store": round(timer.seconds["store"], 4),
+            # embed and upsert batches overlap, so these are summed batch times
+            "embed": round(report.stage_seconds("embed"), 4),
+            "upsert": round(report.stage_seconds("upsert"), 4),
+        },
+        # ru_maxrss is reported in kilobytes on linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list, baseline: dict) -> None:
+    previous = {(r["pages"], r["workers"]): r for r in baseline["results"]}
+    for result in results:
+        before = previous.get((result["pages"], result["workers"]))
+        if not before:
+            continue
+
+        changes = []
+        for metric in (*LOWER_IS_BETTER, "chunks_per_second"):
+            if before.get(metric):
+                change = (result[metric] - before[metric]) / before[metric] * 100
+                changes.append(f"{metric} {change:+.1f}%")
+        print(
+            f"pages={result['pages']} workers={result['workers']}: "
+            + ", ".join(changes)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--lines-per-page", type=int, default=60)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="simulated seconds per API call"
+    )
+    parser.add_argument("--output", default="benchmarks/results")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for pages in args.pages:
+            pdf_path = write_synthetic_pdf(
+                os.path.join(temp_dir, f"{pages}.pdf"),
+                pages,
+                lines_per_page=args.lines_per_page,
+            )
+            with ProcessPoolExecutor(1, mp_context=context) as pool:
+                result = pool.submit(
+                    _run, pdf_path, pages, args.workers, args.latency
+                ).result()
+            print(json.dumps(result))
+            results.append(result)
+
+    now = datetime.datetime.now()
+    os.makedirs(args.output, exist_ok=True)
+    output_path = os.path.join(
+        args.output, f"ingestion-{now.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    with open(output_path, "w") as f:
+        json.dump(
+            {
+                "benchmark": "ingestion",
+                "created_on": now.isoformat(),
+                "revision": _git_revision(),
+                "config": vars(args),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to {output_path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
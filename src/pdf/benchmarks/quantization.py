@@ -0,0 +1,119 @@
+"""
+Recall, latency and size of the local vector store's int8 format against
+float32 (and float16) on synthetic clustered embeddings.
+
+Recall@k is measured against an exact float32 search. "scanned_mb" is the
+matrix every query reads (and that stays paged in), "disk_mb" is
+everything written, including the float16 rows int8 rescores against.
+
+    python -m benchmarks.quantization --vectors 20000 --queries 200
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+import benchmarks  # noqa: F401
+
+
+def synthetic_embeddings(
+    count: int, dimensions: int, clusters: int = 64, seed: int = 0
+) -> np.ndarray:
+    """Gaussian clusters, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(clusters, size=count)]
+    vectors += rng.normal(scale=0.6, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _size_mb(directory: str, scanned: bool) -> float:
+    total = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if scanned and not (name.count(".") == 1 or name.endswith(".scale.npy")):
+                continue
+            if name.endswith(".npy"):
+                total += os.path.getsize(os.path.join(root, name))
+    return round(total / 1024**2, 2)
+
+
+def measure(name, store, queries, exact, k) -> dict:
+    filter = {"pdf_id": "benchmark"}
+    store.query(queries[0].tolist(), top_k=k, filter=filter)  # map the segments
+
+    found, timings = [], []
+    for query in queries:
+        vector = query.tolist()
+        started = time.perf_counter()
+        response = store.query(vector, top_k=k, filter=filter)
+        timings.append(time.perf_counter() - started)
+        found.append({match.id for match in response.matches})
+
+    recall = statistics.mean(
+        len(ids & expected) / k for ids, expected in zip(found, exact)
+    )
+    timings.sort()
+    return {
+        "store": name,
+        "recall_at_k": round(recall, 4),
+        "p50_ms": round(timings[len(timings) // 2] * 1000, 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95)] * 1000, 3),
+        "scanned_mb": _size_mb(store.directory, scanned=True),
+        "disk_mb": _size_mb(store.directory, scanned=False),
+    }
+
+
+def main():
+    from app.chat.vector_stores.local import LocalVectorStore
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimensions", type=int, default=512)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=500, help="vectors per segment")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.vectors, args.dimensions)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(args.vectors, size=args.queries)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+
+    ids = [f"chunk-{i}" for i in range(args.vectors)]
+    scores = queries @ vectors.T / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [
+        {ids[i] for i in np.argsort(-row)[: args.k]}
+        for row in scores.astype(np.float32)
+    ]
+
+    stores = {
+        "float32": {"dtype": "float32"},
+        "float16": {"dtype": "float16"},
+        "int8_no_rescore": {"dtype": "int8", "rescore": 1},
+        "int8_rescore_4": {"dtype": "int8", "rescore": 4},
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, options in stores.items():
+            store = LocalVectorStore(os.path.join(temp_dir, name), **options)
+            for start in range(0, args.vectors, args.batch):
+                store.upsert(
+                    [
+                        {
+                            "id": ids[i],
+                            "values": vectors[i],
+                            "metadata": {"pdf_id": "benchmark"},
+                        }
+                        for i in range(start, min(start + args.batch, args.vectors))
+                    ]
+                )
+            print(json.dumps(measure(name, store, queries, exact, args.k)))
+
+
+if __name__ == "__main__":
+    main()
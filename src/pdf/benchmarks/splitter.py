@@ -0,0 +1,70 @@
+"""
+Throughput of the token splitter against the character splitter it
+replaced, on synthetic page text.
+
+    python -m benchmarks.splitter --pages 200
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.synthetic_pdf import WORDS
+
+
+def synthetic_pages(pages: int, words_per_page: int = 700, seed: int = 0):
+    rng = random.Random(seed)
+    return [
+        "\n".join(
+            " ".join(rng.choice(WORDS) for _ in range(12))
+            for _ in range(words_per_page // 12)
+        )
+        for _ in range(pages)
+    ]
+
+
+def measure(name: str, splitter, pages, encoding) -> dict:
+    started = time.perf_counter()
+    chunks = [chunk for page in pages for chunk in splitter.split_text(page)]
+    seconds = time.perf_counter() - started
+
+    tokens = [len(encoding.encode_ordinary(chunk)) for chunk in chunks]
+    megabytes = sum(len(page) for page in pages) / 1024**2
+    return {
+        "splitter": name,
+        "chunks": len(chunks),
+        "seconds": round(seconds, 4),
+        "mb_per_second": round(megabytes / seconds, 2),
+        "max_chunk_tokens": max(tokens),
+        "mean_chunk_tokens": round(sum(tokens) / len(tokens), 1),
+    }
+
+
+def main():
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from app.text_splitter import TiktokenTextSplitter, get_encoding
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.pages)
+    encoding = get_encoding()
+    splitters = {
+        "recursive_character_500_100": RecursiveCharacterTextSplitter(
+            chunk_size=500, chunk_overlap=100
+        ),
+        "tiktoken_128_24": TiktokenTextSplitter(chunk_size=128, chunk_overlap=24),
+    }
+
+    for name, splitter in splitters.items():
+        # keep the fastest run, the others mostly measure noise
+        runs = [measure(name, splitter, pages, encoding) for _ in range(args.repeat)]
+        print(json.dumps(min(runs, key=lambda run: run["seconds"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Peak RSS of ingestion as the page count grows.
+
+Compares the streaming pipeline (`iter_pdf_chunks` feeding
+`IngestionPipeline`) against materializing every chunk first, which is
+what `create_embeddings_for_pdf` used to do. Each run happens in a fresh
+process so peak RSS is not shared between runs.
+
+    python -m benchmarks.streaming_rss --pages 100 500 1000 2000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import benchmarks  # noqa: F401
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+
+
+def _ingest(pdf_path: str, mode: str) -> dict:
+    from app.chat.create_embeddings import with_pdf_metadata
+    from app.chat.ingestion.extract import iter_pdf_chunks
+    from app.chat.ingestion.pipeline import IngestionPipeline
+    from benchmarks.fakes import CountingIndex, FakeEmbeddings
+
+    started = time.perf_counter()
+    docs = with_pdf_metadata("benchmark", iter_pdf_chunks(pdf_path, workers=1))
+    if mode == "materialized":
+        docs = list(docs)
+
+    index = CountingIndex()
+    IngestionPipeline(FakeEmbeddings(), index).run(docs)
+
+    return {
+        "mode": mode,
+        "vectors": index.vectors,
+        "seconds": round(time.perf_counter() - started, 3),
+        # ru_maxrss is reported in kilobytes on linux
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--modes", nargs="+", default=["streaming", "materialized"])
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for pages in args.pages:
+            pdf_path = write_synthetic_pdf(
+                os.path.join(temp_dir, f"{pages}.pdf"), pages
+            )
+            for mode in args.modes:
+                with ProcessPoolExecutor(1, mp_context=context) as pool:
+                    result = pool.submit(_ingest, pdf_path, mode).result()
+                print(json.dumps({"pages": pages, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import random
+
+WORDS = (
+    "agreement party shall term notice payment section clause invoice "
+    "warranty liability period service customer supplier obligation "
+    "confidential information delivery schedule amount total date "
+    "provided herein accordance pursuant whereas thereof including"
+).split()
+
+
+def _page_text(rng: random.Random, lines: int, words_per_line: int) -> bytes:
+    rows = [
+        " ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines)
+    ]
+    body = " T* ".join(f"({row}) Tj" for row in rows)
+    return f"BT /F1 9 Tf 11 TL 40 800 Td {body} ET".encode()
+
+
+def write_synthetic_pdf(
+    path: str,
+    pages: int,
+    lines_per_page: int = 60,
+    words_per_line: int = 12,
+    seed: int = 0,
+) -> str:
+    """
+    Writes a text-only pdf of the given number of pages, streaming it to
+    disk so that generating thousands of pages stays cheap.
+
+    Object layout: 1 catalog, 2 page tree, 3 font, then a content stream
+    and a page object for every page.
+    """
+    rng = random.Random(seed)
+    offsets = {}
+
+    with open(path, "wb") as f:
+
+        def write_object(number: int, body: bytes) -> None:
+            offsets[number] = f.tell()
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        write_object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+        kids = []
+        for page in range(pages):
+            content, number = 4 + 2 * page, 5 + 2 * page
+            stream = _page_text(rng, lines_per_page, words_per_line)
+            write_object(
+                content,
+                b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+            )
+            write_object(
+                number,
+                b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content,
+            )
+            kids.append(b"%d 0 R" % number)
+
+        write_object(
+            2,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages),
+        )
+        write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref = f.tell()
+        size = max(offsets) + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % size)
+        for number in range(1, size):
+            f.write(b"%010d 00000 n \n" % offsets[number])
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, xref)
+        )
+
+    return path
@@ -0,0 +1,82 @@
+"""
+Run from src/pdf with `python -m pytest`. Like the benchmarks, the tests
+fill in placeholders for the app's environment and never talk to OpenAI,
+Pinecone or Redis. Celery runs tasks eagerly with an in-memory broker.
+"""
+
+import os
+import tempfile
+
+import pytest
+import redis
+import tiktoken
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+os.environ.setdefault("REDIS_URI", "redis://localhost:6379/0")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("EMBEDDING_CACHE_BACKEND", "none")
+os.environ.setdefault("LOCAL_VECTOR_STORE_DIR", "")
+os.environ.setdefault("CELERY_ALWAYS_EAGER", "true")
+os.environ.setdefault("BM25_INDEX_DIR", tempfile.mkdtemp(prefix="bm25-"))
+os.environ.setdefault("BLOB_CACHE_DIR", tempfile.mkdtemp(prefix="blob-cache-"))
+
+# The worker module creates the flask app the celery tasks run in, so the
+# tests share its database
+from app.celery.worker import flask_app  # noqa: E402
+from app import text_splitter  # noqa: E402
+from app.chat.ingestion import extract  # noqa: E402
+from app.web.db import db  # noqa: E402
+from app.web.db.models import User  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    return User.create(email="test@example.com", password="test")
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+class DownRedis:
+    """A redis client whose every command fails as if the server were down."""
+
+    def __getattr__(self, name):
+        def unavailable(*args, **kwargs):
+            raise redis.ConnectionError("redis is down")
+
+        return unavailable
+
+
+@pytest.fixture
+def down_redis():
+    return DownRedis()
+
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """
+    Splits pdfs on a byte level encoding, since tiktoken downloads the
+    real ones on first use.
+    """
+    encoding = tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([byte]): byte for byte in range(256)},
+        special_tokens={},
+    )
+    monkeypatch.setattr(extract, "get_encoding_for_model", lambda model: encoding)
+    monkeypatch.setattr(text_splitter, "get_encoding", lambda name: encoding)
+    return encoding
@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import json
+
+import numpy as np
+import pytest
+from app.chat import answer_cache
+from app.chat.answer_cache import AnswerCache, AnswerLookup
+from app.chat.embeddings.shared import aembed_query, share_query_embedding
+from app.chat.vector_stores import retrieval_cache
+from benchmarks.fakes import FakeEmbeddings
+
+KEY = "answer_cache:pdf:0:model:8"
+
+
+@pytest.fixture
+def cache(redis_client, monkeypatch):
+    # the pdf generation is read from the shared client
+    monkeypatch.setattr(retrieval_cache, "client", redis_client)
+    monkeypatch.setattr(answer_cache, "client", redis_client)
+    return AnswerCache(
+        FakeEmbeddings(dimensions=8),
+        redis_client,
+        threshold=0.95,
+        ttl=60,
+        model="model",
+    )
+
+
+def entry(question, vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return json.dumps(
+        {
+            "question": question,
+            "answer": f"answer to {question}",
+            "seconds": 1.0,
+            "vector": base64.b64encode(vector.tobytes()).decode(),
+        }
+    )
+
+
+def test_sync_of_a_missing_list_is_empty(cache):
+    index = cache._sync(KEY)
+
+    assert index.vectors is None
+    assert index.entries == ()
+
+
+def test_sync_loads_the_list(cache, redis_client):
+    redis_client.rpush(KEY, entry("a", np.eye(8)[0]), entry("b", np.eye(8)[1]))
+
+    index = cache._sync(KEY)
+
+    assert [e["question"] for e in index.entries] == ["a", "b"]
+    assert index.vectors.shape == (2, 8)
+
+
+def test_sync_only_reads_entries_appended_since(cache, redis_client, monkeypatch):
+    redis_client.rpush(KEY, entry("a", np.eye(8)[0]))
+    first = cache._sync(KEY)
+    redis_client.rpush(KEY, entry("b", np.eye(8)[1]))
+
+    ranges = []
+    lrange = redis_client.lrange
+    monkeypatch.setattr(
+        redis_client,
+        "lrange",
+        lambda key, start, end: ranges.append((start, end)) or lrange(key, start, end),
+    )
+    second = cache._sync(KEY)
+
+    assert ranges == [(1, 1)]
+    assert [e["question"] for e in second.entries] == ["a", "b"]
+    # the index seen by earlier readers is left as it was
+    assert [e["question"] for e in first.entries] == ["a"]
+
+
+def test_sync_reuses_an_index_that_is_up_to_date(cache, redis_client):
+    redis_client.rpush(KEY, entry("a", np.eye(8)[0]))
+
+    assert cache._sync(KEY) is cache._sync(KEY)
+
+
+def test_sync_starts_over_when_the_list_was_recreated(cache, redis_client):
+    redis_client.rpush(KEY, entry("a", np.eye(8)[0]), entry("b", np.eye(8)[1]))
+    cache._sync(KEY)
+    redis_client.delete(KEY)
+    redis_client.rpush(KEY, entry("c", np.eye(8)[2]))
+
+    index = cache._sync(KEY)
+
+    assert [e["question"] for e in index.entries] == ["c"]
+
+
+def test_entries_of_another_width_fall_through(cache, redis_client):
+    redis_client.rpush(KEY, entry("a", np.eye(8)[0]), entry("b", np.eye(4)[0]))
+
+    lookup = cache._search("pdf", list(np.eye(8)[0]))
+
+    assert lookup.key is None
+    assert lookup.hit is None
+
+
+def test_stored_answers_are_served_for_the_same_question(cache):
+    question = "What is the notice period?"
+
+    miss = asyncio.run(cache.lookup("pdf", question))
+    cache.store(miss, question, "Thirty days.", seconds=2.0)
+    hit = asyncio.run(cache.lookup("pdf", question))
+
+    assert miss.hit is None
+    assert hit.hit.answer == "Thirty days."
+    assert hit.hit.score == pytest.approx(1.0)
+    assert answer_cache.answer_cache_stats()["hits"] == 1
+
+
+def test_other_questions_miss(cache):
+    miss = asyncio.run(cache.lookup("pdf", "What is the notice period?"))
+    cache.store(miss, "What is the notice period?", "Thirty days.", seconds=2.0)
+
+    lookup = asyncio.run(cache.lookup("pdf", "Who is the supplier?"))
+
+    assert lookup.hit is None
+    assert lookup.key == miss.key
+
+
+def test_lookups_without_redis_are_not_stored(cache, redis_client):
+    cache.store(AnswerLookup(key=None, vector=[1.0] * 8), "q", "a", seconds=1.0)
+
+    assert redis_client.keys("answer_cache:pdf:*") == []
+
+
+def test_shared_embedding_is_requested_once():
+    embeddings = FakeEmbeddings(dimensions=8)
+
+    async def answer():
+        share_query_embedding(embeddings, "question")
+        return await asyncio.gather(
+            asyncio.ensure_future(aembed_query(embeddings, "question")),
+            asyncio.ensure_future(aembed_query(embeddings, "question")),
+            aembed_query(embeddings, "another question"),
+        )
+
+    first, second, other = asyncio.run(answer())
+
+    assert first == second != other
+    assert embeddings.calls == 2
+
+
+def test_shared_embedding_waits_to_be_asked_for():
+    embeddings = FakeEmbeddings(dimensions=8)
+
+    async def answer():
+        share_query_embedding(embeddings, "question")
+        await asyncio.sleep(0.01)
+
+    asyncio.run(answer())
+
+    assert embeddings.calls == 0
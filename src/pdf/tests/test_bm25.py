@@ -0,0 +1,142 @@
+import math
+import os
+
+import pytest
+from app.chat.vector_stores import bm25
+from app.chat.vector_stores.bm25 import BM25Index, BM25IndexCache, tokenize
+
+CHUNKS = [
+    ("c1", 1, "The supplier shall pay the invoice within thirty days."),
+    ("c2", 2, "Clause 4.2.1 limits liability to the invoice amount."),
+    ("c3", 3, "Error ERR-404 is returned when the document is missing."),
+    ("c4", None, "The customer and the supplier agree on the delivery schedule."),
+]
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(CHUNKS)
+
+
+def test_tokenize_keeps_identifiers_whole_and_by_part():
+    assert tokenize("See clause 4.2.1 and ERR-404") == [
+        "see",
+        "clause",
+        "4.2.1",
+        "4",
+        "2",
+        "1",
+        "and",
+        "err-404",
+        "err",
+        "404",
+    ]
+
+
+def test_search_finds_exact_identifiers(index):
+    [(chunk_id, page, score)] = index.search("4.2.1", k=1)
+
+    assert (chunk_id, page) == ("c2", 2)
+    assert score > 0
+
+
+def test_search_ranks_rare_terms_higher(index):
+    results = index.search("supplier delivery", k=4)
+
+    # "delivery" only appears in c4, "supplier" in c1 and c4
+    assert [chunk_id for chunk_id, _, _ in results] == ["c4", "c1"]
+    assert results[0][2] > results[1][2]
+
+
+def test_search_prefers_shorter_documents_for_the_same_term():
+    index = BM25Index.build(
+        [
+            ("short", 1, "invoice due"),
+            ("long", 1, "invoice " + " ".join(["padding"] * 50)),
+        ]
+    )
+
+    results = index.search("invoice", k=2)
+
+    assert [chunk_id for chunk_id, _, _ in results] == ["short", "long"]
+
+
+def test_search_matches_scores_computed_by_hand(index):
+    k1, b = 1.2, 0.75
+    lengths = [len(tokenize(text)) for _, _, text in CHUNKS]
+    average = sum(lengths) / len(lengths)
+    # "invoice" occurs once in c1 and c2
+    idf = math.log1p((4 - 2 + 0.5) / (2 + 0.5))
+    expected = {
+        chunk_id: idf * (k1 + 1) / (1 + k1 * (1 - b + b * length / average))
+        for (chunk_id, _, _), length in zip(CHUNKS, lengths)
+        if chunk_id in ("c1", "c2")
+    }
+
+    results = index.search("invoice", k=4, k1=k1, b=b)
+
+    assert {chunk_id: score for chunk_id, _, score in results} == pytest.approx(
+        expected, rel=1e-5
+    )
+
+
+def test_search_without_matches(index):
+    assert index.search("unrelated words") == []
+    assert BM25Index.build([]).search("invoice") == []
+
+
+def test_missing_pages_are_stored_as_minus_one(index):
+    [(_, page, _)] = index.search("customer", k=1)
+
+    assert page == -1
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+
+    assert loaded.search("liability invoice", k=4) == index.search(
+        "liability invoice", k=4
+    )
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25.settings, "bm25_index_dir", str(tmp_path))
+    return tmp_path
+
+
+def test_cache_reuses_loaded_indexes(index, index_dir, monkeypatch):
+    index.save(bm25.index_path("pdf"))
+    cache = BM25IndexCache(max_size=2)
+
+    assert cache.get("pdf") is cache.get("pdf")
+
+
+def test_cache_reloads_a_rewritten_index(index, index_dir):
+    path = bm25.index_path("pdf")
+    index.save(path)
+    cache = BM25IndexCache(max_size=2)
+    first = cache.get("pdf")
+
+    BM25Index.build(CHUNKS[:1]).save(path)
+    os.utime(path, (0, os.stat(path).st_mtime + 1))
+
+    assert cache.get("pdf") is not first
+    assert cache.get("pdf").search("liability", k=4) == []
+
+
+def test_cache_drops_the_least_recently_used_index(index, index_dir):
+    for pdf_id in ["a", "b", "c"]:
+        index.save(bm25.index_path(pdf_id))
+    cache = BM25IndexCache(max_size=2)
+    a = cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+
+    assert cache.get("a") is a
+    assert len(cache._indexes) == 2
+    assert "b" not in cache._indexes
@@ -0,0 +1,83 @@
+from app.chat.context import find_overlap, merge_passages
+from langchain_core.documents import Document
+
+
+def doc(text, page=1, pdf_id="pdf"):
+    return Document(page_content=text, metadata={"pdf_id": pdf_id, "page": page})
+
+
+def test_find_overlap_returns_shared_text_length():
+    assert find_overlap("the quick brown fox jumps", "brown fox jumps over", 5) == 15
+
+
+def test_find_overlap_ignores_short_coincidences():
+    assert find_overlap("ends with the", "the start", min_chars=16) == 0
+    assert find_overlap("abc", "abc", min_chars=16) == 0
+
+
+def test_find_overlap_picks_longest_suffix():
+    head = "one two three one two three"
+    tail = "one two three four"
+    assert find_overlap(head, tail, min_chars=4) == len("one two three")
+
+
+def test_find_overlap_without_shared_text():
+    assert find_overlap("a" * 40, "b" * 40) == 0
+
+
+def test_merge_passages_joins_overlapping_chunks_of_a_page():
+    first = "The supplier shall deliver the goods within thirty days of the order."
+    second = "within thirty days of the order. Late deliveries incur a penalty."
+
+    passages = merge_passages([doc(first), doc(second)])
+
+    assert len(passages) == 1
+    assert passages[0].text == (
+        "The supplier shall deliver the goods within thirty days of the order."
+        " Late deliveries incur a penalty."
+    )
+    assert len(passages[0].docs) == 2
+
+
+def test_merge_passages_joins_in_either_order():
+    first = "The supplier shall deliver the goods within thirty days of the order."
+    second = "within thirty days of the order. Late deliveries incur a penalty."
+
+    [passage] = merge_passages([doc(second), doc(first)])
+
+    assert passage.text.startswith("The supplier")
+    assert passage.text.endswith("penalty.")
+
+
+def test_merge_passages_keeps_pages_apart():
+    text = "The supplier shall deliver the goods within thirty days of the order."
+
+    passages = merge_passages([doc(text, page=1), doc(text, page=2)])
+
+    assert [p.key for p in passages] == [("pdf", 1), ("pdf", 2)]
+
+
+def test_merge_passages_bridges_gap_between_passages():
+    a = "Section one covers payment terms and invoices in detail here."
+    b = "Section three covers warranty and liability for all services."
+    bridge = (
+        "invoices in detail here. Section two links to Section three covers warranty"
+    )
+
+    passages = merge_passages([doc(a), doc(b), doc(bridge)])
+
+    assert len(passages) == 1
+    assert passages[0].text == (
+        "Section one covers payment terms and invoices in detail here."
+        " Section two links to Section three covers warranty and liability"
+        " for all services."
+    )
+    assert len(passages[0].docs) == 3
+
+
+def test_merge_passages_keeps_relevance_order():
+    passages = merge_passages(
+        [doc("a" * 40, page=3), doc("b" * 40, page=1), doc("c" * 40, page=2)]
+    )
+
+    assert [p.key[1] for p in passages] == [3, 1, 2]
@@ -0,0 +1,56 @@
+import pytest
+from app.chat.embeddings.cache import CachedEmbeddings, RedisEmbeddingStore
+from benchmarks.fakes import FakeEmbeddings
+
+
+@pytest.fixture
+def binary_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeRedis()
+
+
+def test_cached_vectors_are_not_embedded_again(binary_redis):
+    underlying = FakeEmbeddings(dimensions=8)
+    embeddings = CachedEmbeddings(
+        underlying, RedisEmbeddingStore(binary_redis, max_bytes=1 << 20)
+    )
+
+    first = embeddings.embed_documents(["a", "b", "a"])
+    second = embeddings.embed_documents(["b", "a"])
+
+    # vectors come back from the store as float32
+    assert second[0] == pytest.approx(first[1])
+    assert second[1] == pytest.approx(first[0])
+    assert underlying.calls == 1
+    assert embeddings.stats() == {"hits": 3, "misses": 2, "hit_rate": 0.6}
+
+
+def test_redis_errors_fail_open(down_redis):
+    underlying = FakeEmbeddings(dimensions=8)
+    embeddings = CachedEmbeddings(
+        underlying, RedisEmbeddingStore(down_redis, max_bytes=1 << 20)
+    )
+
+    assert embeddings.embed_documents(["a", "b"]) == underlying.embed_documents(
+        ["a", "b"]
+    )
+    assert embeddings.embed_query("a") == underlying._embed("a")
+    assert embeddings.stats()["misses"] == 3
+
+
+def test_cache_stats_endpoint_includes_the_embedding_cache(app, user, monkeypatch):
+    from app.web.views import score_views
+
+    monkeypatch.setattr(score_views, "retrieval_cache_stats", lambda: {})
+    monkeypatch.setattr(score_views, "answer_cache_stats", lambda: {})
+    monkeypatch.setattr(
+        score_views, "embedding_cache_stats", lambda: {"hits": 1, "misses": 0}
+    )
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["user_id"] = user.id
+
+    response = client.get("/api/scores/cache")
+
+    assert response.status_code == 200
+    assert response.json["embedding"] == {"hits": 1, "misses": 0}
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+from app.chat.vector_stores.hybrid import HybridRetriever
+from app.chat.vector_stores.pinecone import PineconeRetriever
+from app.chat.vector_stores.retrieval_cache import DEGRADED
+from benchmarks.fakes import FakeEmbeddings, InMemoryIndex
+from langchain_core.documents import Document
+
+
+def keyword_search(self, query):
+    return [
+        Document(id=f"keyword-{i}", page_content=f"keyword {i}", metadata={})
+        for i in range(4)
+    ]
+
+
+@pytest.fixture
+def retriever(monkeypatch):
+    monkeypatch.setattr(HybridRetriever, "_keyword_search", keyword_search)
+
+    def build(latency):
+        return HybridRetriever(
+            vector_retriever=PineconeRetriever(
+                index=InMemoryIndex(),
+                embeddings=FakeEmbeddings(dimensions=8, latency=latency),
+                search_kwargs={"k": 4},
+            ),
+            pdf_id="pdf",
+            k=2,
+            deadline=0.2,
+        )
+
+    return build
+
+
+def test_slow_embedding_falls_back_to_keyword_results(retriever):
+    started = time.monotonic()
+    docs = retriever(latency=1.0).invoke("clause 4.2.1")
+
+    assert time.monotonic() - started < 0.9
+    assert [doc.id for doc in docs] == ["keyword-0", "keyword-1"]
+    assert all(doc.metadata[DEGRADED] for doc in docs)
+
+
+def test_slow_embedding_falls_back_to_keyword_results_async(retriever):
+    async def invoke():
+        # asyncio.run itself waits for the abandoned embedding thread
+        started = time.monotonic()
+        docs = await retriever(latency=1.0).ainvoke("clause 4.2.1")
+        return docs, time.monotonic() - started
+
+    docs, seconds = asyncio.run(invoke())
+
+    assert seconds < 0.9
+    assert [doc.id for doc in docs] == ["keyword-0", "keyword-1"]
+    assert all(doc.metadata[DEGRADED] for doc in docs)
+
+
+def test_results_within_the_deadline_are_fused(retriever, monkeypatch):
+    vector = [Document(id="vector-0", page_content="vector 0", metadata={})]
+    monkeypatch.setattr(
+        PineconeRetriever, "search_by_vector", lambda self, embedding: vector
+    )
+
+    docs = retriever(latency=0.0).invoke("clause 4.2.1")
+
+    assert {doc.id for doc in docs} == {"vector-0", "keyword-0"}
+    assert not any(doc.metadata.get(DEGRADED) for doc in docs)
@@ -0,0 +1,232 @@
+import threading
+
+import pytest
+from app.chat import create_embeddings
+from app.chat.ingestion.pipeline import IngestionPipeline, batched
+from app.chat.vector_stores.bm25 import bm25_indexes
+from app.web import files
+from app.web.db import db
+from app.web.db.models import Chunk, Pdf
+from app.web.tasks import embeddings as tasks
+from benchmarks.fakes import FakeEmbeddings, InMemoryIndex
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from langchain_core.documents import Document
+
+
+class FlakyIndex(InMemoryIndex):
+    """Fails the first `failures` upserts."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        with self._calls_lock:
+            self.calls += 1
+            failing = self.calls <= self.failures
+        if failing:
+            raise ConnectionError("upsert failed")
+        return super().upsert(vectors, namespace=namespace)
+
+
+class FlakyEmbeddings(FakeEmbeddings):
+    def __init__(self, failures: int):
+        super().__init__(dimensions=8)
+        self.failures = failures
+
+    def embed_documents(self, texts):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise ConnectionError("embedding failed")
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # backoff waits between retries with time.sleep
+    monkeypatch.setattr("backoff._sync.time.sleep", lambda seconds: None)
+
+
+def docs(count):
+    return [
+        Document(id=f"chunk-{i}", page_content=f"text {i}", metadata={"page": i})
+        for i in range(count)
+    ]
+
+
+def stage(report, name):
+    return [t for t in report.timings if t.stage == name]
+
+
+def test_batched():
+    assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(batched([], 3)) == []
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_embeds_and_upserts_in_batches(concurrency):
+    index = InMemoryIndex()
+    pipeline = IngestionPipeline(
+        FakeEmbeddings(dimensions=8),
+        index,
+        embed_batch_size=4,
+        upsert_batch_size=3,
+        concurrency=concurrency,
+    )
+
+    report = pipeline.run(docs(10))
+
+    assert report.vectors == 10
+    assert sorted(index.records) == sorted(f"chunk-{i}" for i in range(10))
+    assert index.records["chunk-7"]["metadata"] == {"page": 7}
+    assert [t.size for t in stage(report, "embed")] == [4, 4, 2]
+    # each embedded batch is upserted in slices of at most 3
+    assert sorted(t.size for t in stage(report, "upsert")) == [1, 1, 2, 3, 3]
+    assert report.first_vector_seconds <= report.seconds
+
+
+def test_consumes_documents_lazily():
+    consumed = []
+
+    def stream():
+        for doc in docs(20):
+            consumed.append(doc.id)
+            yield doc
+
+    embeddings = FakeEmbeddings(dimensions=8)
+    seen = []
+    embed_documents = embeddings.embed_documents
+    embeddings.embed_documents = lambda texts: (
+        seen.append(len(consumed)) or embed_documents(texts)
+    )
+
+    IngestionPipeline(
+        embeddings, InMemoryIndex(), embed_batch_size=5, concurrency=1
+    ).run(stream())
+
+    # batches are embedded while the stream is still being read
+    assert seen[0] < 20
+
+
+def test_retries_failed_upserts():
+    index = FlakyIndex(failures=2)
+    pipeline = IngestionPipeline(
+        FakeEmbeddings(dimensions=8),
+        index,
+        embed_batch_size=10,
+        upsert_batch_size=10,
+        concurrency=1,
+        max_retries=3,
+    )
+
+    report = pipeline.run(docs(10))
+
+    assert report.vectors == 10
+    assert len(index.records) == 10
+    assert [t.attempts for t in stage(report, "upsert")] == [3]
+
+
+def test_retries_failed_embedding_batches():
+    pipeline = IngestionPipeline(
+        FlakyEmbeddings(failures=1),
+        InMemoryIndex(),
+        embed_batch_size=5,
+        concurrency=1,
+        max_retries=2,
+    )
+
+    report = pipeline.run(docs(10))
+
+    assert report.vectors == 10
+    assert [t.attempts for t in stage(report, "embed")] == [2, 1]
+
+
+def test_gives_up_after_max_retries():
+    pipeline = IngestionPipeline(
+        FakeEmbeddings(dimensions=8), FlakyIndex(failures=5), max_retries=2
+    )
+
+    with pytest.raises(ConnectionError):
+        pipeline.run(docs(3))
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = InMemoryIndex()
+    monkeypatch.setattr(create_embeddings, "embeddings", FakeEmbeddings(dimensions=8))
+    monkeypatch.setattr(create_embeddings, "get_ingestion_index", lambda: index)
+    return index
+
+
+def test_ingesting_again_replaces_chunks(user, index, byte_encoding, tmp_path):
+    pdf = Pdf.create(name="contract.pdf", user_id=user.id)
+    path = write_synthetic_pdf(str(tmp_path / "contract.pdf"), pages=3)
+
+    create_embeddings.create_embeddings_for_pdf(pdf.id, path)
+    ids = sorted(index.records)
+    create_embeddings.create_embeddings_for_pdf(pdf.id, path, page_range=(1, 2))
+
+    assert len(ids) > 3
+    assert sorted(index.records) == ids
+    assert sorted(chunk.id for chunk in Chunk.where(pdf_id=pdf.id)) == ids
+
+
+def test_chunk_ids_depend_on_pdf_page_and_position():
+    docs = [
+        Document(page_content=text, metadata={"page": page})
+        for text, page in [("a", 0), ("b", 0), ("c", 1)]
+    ]
+
+    ids = [doc.id for doc in create_embeddings.with_pdf_metadata("pdf", docs)]
+
+    assert ids == [
+        create_embeddings.chunk_id("pdf", 0, 0),
+        create_embeddings.chunk_id("pdf", 0, 1),
+        create_embeddings.chunk_id("pdf", 1, 0),
+    ]
+    assert len(set(ids)) == 3
+    assert create_embeddings.chunk_id("other", 0, 0) not in ids
+
+
+def test_process_document_ingests_every_page_range(
+    user, index, byte_encoding, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(tasks.settings, "ingestion_pages_per_task", 2)
+
+    pdf = Pdf.create(name="contract.pdf", user_id=user.id)
+    path = write_synthetic_pdf(str(tmp_path / "contract.pdf"), pages=5)
+    files.blob_cache.put(pdf.id, path)
+
+    # runs inline, chord callback included, see CELERY_ALWAYS_EAGER
+    tasks.process_document.delay(pdf.id)
+
+    chunks = Chunk.where(pdf_id=pdf.id)
+    assert len(chunks) > 0
+    assert sorted(index.records) == sorted(chunk.id for chunk in chunks)
+    assert {record["metadata"]["page"] for record in index.records.values()} == set(
+        range(5)
+    )
+    # the tasks committed through sessions of their own
+    db.session.refresh(pdf)
+    assert pdf.indexed
+    assert bm25_indexes.get(pdf.id).search("invoice")
+
+
+def test_priority_drops_as_pdfs_grow():
+    assert [tasks.ingestion_priority(n) for n in [1, 10, 20, 40, 600, 10**6]] == [
+        9,
+        9,
+        8,
+        7,
+        4,
+        0,
+    ]
+
+
+def test_upload_priority_estimates_pages_from_the_file_size(tmp_path):
+    path = tmp_path / "large.pdf"
+    path.write_bytes(b"0" * tasks.BYTES_PER_PAGE * 40)
+
+    assert tasks.upload_priority(str(path)) == tasks.ingestion_priority(40)
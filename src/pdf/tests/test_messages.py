@@ -0,0 +1,51 @@
+import pytest
+from app.web.api import (
+    add_message_to_conversation,
+    add_messages_to_conversation,
+    get_messages_by_conversation_id,
+    iter_recent_messages_by_conversation_id,
+)
+from app.web.db import db
+from app.web.db.models import Conversation, Pdf
+from langchain_core.messages import AIMessage, HumanMessage
+
+
+@pytest.fixture
+def conversation(user):
+    pdf = Pdf.create(name="doc.pdf", user_id=user.id)
+    return Conversation.create(pdf_id=pdf.id, user_id=user.id)
+
+
+def turns(count):
+    messages = []
+    for number in range(count):
+        messages += [HumanMessage(f"question {number}"), AIMessage(f"answer {number}")]
+    return messages
+
+
+def test_messages_of_one_commit_keep_their_order(conversation):
+    messages = turns(20)
+    for start in range(0, len(messages), 2):
+        add_messages_to_conversation(conversation.id, messages[start : start + 2])
+
+    assert get_messages_by_conversation_id(conversation.id) == messages
+    recent = iter_recent_messages_by_conversation_id(conversation.id, 3)
+    assert list(recent) == messages[::-1][:3]
+
+    db.session.expire(conversation)
+    assert [m.content for m in conversation.messages] == [m.content for m in messages]
+
+
+def test_single_and_batched_messages_interleave_in_order(conversation):
+    add_message_to_conversation(conversation.id, "human", "first")
+    add_messages_to_conversation(
+        conversation.id, [AIMessage("second"), HumanMessage("third")]
+    )
+    add_message_to_conversation(conversation.id, "ai", "fourth")
+
+    assert [m.content for m in get_messages_by_conversation_id(conversation.id)] == [
+        "first",
+        "second",
+        "third",
+        "fourth",
+    ]
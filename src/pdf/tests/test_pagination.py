@@ -0,0 +1,138 @@
+import datetime
+
+import pytest
+from app.web.db import db
+from app.web.db.models import Conversation, Message, Pdf
+from app.web.pagination import decode_cursor, encode_cursor, keyset_page
+from werkzeug.exceptions import BadRequest
+
+
+@pytest.fixture
+def conversations(user):
+    pdf = Pdf.create(name="doc.pdf", user_id=user.id)
+    start = datetime.datetime(2024, 1, 1)
+    # pairs share a timestamp, so pages have to break ties on the id
+    return [
+        Conversation.create(
+            id=f"conversation-{number:02}",
+            pdf_id=pdf.id,
+            user_id=user.id,
+            created_on=start + datetime.timedelta(seconds=number // 2),
+        )
+        for number in range(7)
+    ]
+
+
+def newest_first(conversations):
+    return sorted(conversations, key=lambda c: (c.created_on, c.id), reverse=True)
+
+
+def walk(limit):
+    pages, cursor = [], None
+    while True:
+        rows, cursor = keyset_page(db.select(Conversation), Conversation, limit, cursor)
+        pages.append([row.id for row in rows])
+        if cursor is None:
+            return pages
+        # a cursor that does not move past its own row never ends the walk
+        assert len(pages) <= 10
+
+
+def test_cursor_round_trip():
+    created_on = datetime.datetime(2024, 5, 6, 7, 8, 9, 123)
+
+    assert decode_cursor(encode_cursor(created_on, "abc")) == (created_on, "abc")
+
+
+def test_invalid_cursor_is_a_bad_request():
+    with pytest.raises(BadRequest):
+        decode_cursor("not a cursor")
+
+
+def test_first_page_is_newest_first(conversations):
+    rows, cursor = keyset_page(db.select(Conversation), Conversation, limit=3)
+
+    assert rows == newest_first(conversations)[:3]
+    assert cursor == encode_cursor(rows[-1].created_on, rows[-1].id)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+def test_pages_cover_every_row_once(conversations, limit):
+    pages = walk(limit)
+
+    assert [id for page in pages for id in page] == [
+        c.id for c in newest_first(conversations)
+    ]
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_rows_added_meanwhile_do_not_shift_pages(conversations, user):
+    first, cursor = keyset_page(db.select(Conversation), Conversation, limit=3)
+    Conversation.create(
+        id="conversation-new",
+        pdf_id=conversations[0].pdf_id,
+        user_id=user.id,
+        created_on=datetime.datetime(2025, 1, 1),
+    )
+
+    second, _ = keyset_page(db.select(Conversation), Conversation, 3, cursor)
+
+    assert second == newest_first(conversations)[3:6]
+
+
+def test_last_page_has_no_cursor(conversations):
+    rows, cursor = keyset_page(db.select(Conversation), Conversation, limit=7)
+
+    assert len(rows) == 7
+    assert cursor is None
+
+
+def test_rows_stamped_on_create_page_through(user):
+    pdf = Pdf.create(name="doc.pdf", user_id=user.id)
+    created = [Conversation.create(pdf_id=pdf.id, user_id=user.id) for _ in range(5)]
+
+    pages = walk(2)
+
+    assert sorted(id for page in pages for id in page) == sorted(c.id for c in created)
+
+
+def test_server_default_timestamps_page_through_after_migrating(app, user):
+    pdf = Pdf.create(name="doc.pdf", user_id=user.id)
+    # rows inserted before created_on was stamped from python
+    for number in range(5):
+        db.session.execute(
+            db.text(
+                "INSERT INTO conversation (id, pdf_id, user_id) "
+                "VALUES (:id, :pdf_id, :user_id)"
+            ),
+            {"id": f"conversation-{number}", "pdf_id": pdf.id, "user_id": user.id},
+        )
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["migrate-db"])
+    assert result.exit_code == 0, result.output
+
+    pages = walk(2)
+
+    assert [id for page in pages for id in page] == [
+        f"conversation-{number}" for number in reversed(range(5))
+    ]
+
+
+def test_summaries_pick_one_last_message_on_ties(conversations):
+    conversation = conversations[0]
+    created_on = datetime.datetime(2024, 2, 1)
+    for id in ["message-a", "message-c", "message-b"]:
+        Message.create(
+            id=id,
+            conversation_id=conversation.id,
+            role="human",
+            content=id,
+            created_on=created_on,
+        )
+
+    summaries = Conversation.summaries([conversation.id, conversations[1].id])
+
+    assert summaries[conversation.id]["message_count"] == 3
+    assert summaries[conversation.id]["last_message"]["id"] == "message-c"
+    assert summaries[conversations[1].id] == {"message_count": 0, "last_message": None}
@@ -0,0 +1,50 @@
+from app.web.db import db
+from app.web.db.models import Pdf
+
+
+def test_find_source_prefers_indexed_pdfs(user):
+    Pdf.create(name="a.pdf", user_id=user.id, content_hash="hash")
+    indexed = Pdf.create(
+        name="b.pdf", user_id=user.id, content_hash="hash", indexed=True
+    )
+    Pdf.create(
+        name="c.pdf",
+        user_id=user.id,
+        content_hash="hash",
+        alias_of=indexed.id,
+        indexed=True,
+    )
+
+    assert Pdf.find_source("hash") == indexed
+
+
+def test_find_source_skips_pdfs_still_ingesting(user):
+    Pdf.create(name="a.pdf", user_id=user.id, content_hash="hash")
+
+    assert Pdf.find_source("hash") is None
+
+
+def test_migrate_db_adds_the_pdf_columns(app, user):
+    db.session.execute(db.text("DROP TABLE pdf"))
+    db.session.execute(
+        db.text(
+            "CREATE TABLE pdf (id VARCHAR PRIMARY KEY, name VARCHAR(80) NOT NULL, "
+            "user_id INTEGER NOT NULL)"
+        )
+    )
+    db.session.execute(
+        db.text("INSERT INTO pdf (id, name, user_id) VALUES ('old', 'old.pdf', :id)"),
+        {"id": user.id},
+    )
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["migrate-db"])
+    assert result.exit_code == 0, result.output
+
+    columns = {c["name"] for c in db.inspect(db.engine).get_columns("pdf")}
+    assert {"content_hash", "alias_of", "indexed"} <= columns
+    indexes = {i["name"] for i in db.inspect(db.engine).get_indexes("pdf")}
+    assert "ix_pdf_content_hash" in indexes
+    assert db.session.get(Pdf, "old").indexed
+    # and running it again changes nothing
+    assert app.test_cli_runner().invoke(args=["migrate-db"]).exit_code == 0
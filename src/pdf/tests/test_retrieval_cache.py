@@ -0,0 +1,22 @@
+from app.chat.vector_stores import retrieval_cache
+
+
+def test_stats_count_hits_and_misses(redis_client, monkeypatch):
+    monkeypatch.setattr(retrieval_cache, "client", redis_client)
+    redis_client.hset(retrieval_cache.STATS_KEY, mapping={"hits": 3, "misses": 1})
+
+    assert retrieval_cache.retrieval_cache_stats() == {
+        "hits": 3,
+        "misses": 1,
+        "hit_rate": 0.75,
+    }
+
+
+def test_stats_without_redis_are_empty(down_redis, monkeypatch):
+    monkeypatch.setattr(retrieval_cache, "client", down_redis)
+
+    assert retrieval_cache.retrieval_cache_stats() == {
+        "hits": 0,
+        "misses": 0,
+        "hit_rate": 0.0,
+    }